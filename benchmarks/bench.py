@@ -0,0 +1,383 @@
+"""
+Benchmarks of the solver hot paths across the projects
+
+Usage:
+    python benchmarks/bench.py                      # run all benchmarks and append to the history
+    python benchmarks/bench.py --quick              # only the smallest problem sizes
+    python benchmarks/bench.py -k solve_discrete    # only benchmarks whose name contains the pattern
+    python benchmarks/bench.py --save-baseline      # store the results as the new baseline
+    python benchmarks/bench.py --compare            # flag regressions against the baseline (exit code 1 if any)
+    python benchmarks/bench.py --check-imports      # check the import time and dependencies of each project (exit code 1 if violated)
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import warnings
+import tracemalloc
+import subprocess
+import io
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+# Make the project modules and the shared modules importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for project in ('inauguralproject', 'modelproject', 'dataproject', 'shared'):
+    sys.path.append(os.path.join(ROOT, project))
+
+# Files with the history of all runs and the baseline
+HISTORY_FILE = os.path.join(ROOT, 'benchmarks', 'history.jsonl')
+BASELINE_FILE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+# Modules the import of each project must not load (plotting and symbolic packages are imported on first use)
+IMPORT_CHECKS = {
+    'inauguralproject': ('pandas', 'matplotlib', 'seaborn', 'scipy.stats'),
+    'modelproject': ('pandas', 'matplotlib', 'sympy'),
+    'dataproject': ('matplotlib', 'seaborn', 'adjustText', 'yfinance'),
+    'examproject': ('pandas', 'matplotlib', 'sympy'),
+}
+
+# Registry of benchmarks: name -> (function, list of parameter dictionaries)
+BENCHMARKS = {}
+
+
+def benchmark(*params):
+    """ Registers a benchmark function for each parameter dictionary (the first is the quick size) """
+    def register(func):
+        BENCHMARKS[func.__name__] = (func, list(params))
+        return func
+    return register
+
+
+@contextlib.contextmanager
+def count_calls(obj, name, counter):
+    """ Counts the calls of the attribute name of obj (a module or an instance) while active """
+    original = getattr(obj, name)
+
+    def counted(*args, **kwargs):
+        counter[0] += 1
+        return original(*args, **kwargs)
+
+    setattr(obj, name, counted)
+    try:
+        yield
+    finally:
+        # Restore the class method (instances) or the module function
+        if name in getattr(obj, '__dict__', {}) and not isinstance(obj, type(sys)):
+            delattr(obj, name)
+        else:
+            setattr(obj, name, original)
+
+
+# Benchmarks of the household model
+
+def _household(**par):
+    from inauguralproject import HouseholdSpecializationModelClass
+    model = HouseholdSpecializationModelClass()
+    for key, value in par.items():
+        setattr(model.par, key, value)
+    return model
+
+@benchmark({'step': 1.0}, {'step': 0.5}, {'step': 0.25})
+def solve_discrete(step):
+    model = _household(discrete_step=step)
+    counter = [0]
+    def run():
+        model.clear_cache()
+        with count_calls(model, 'calc_utility', counter):
+            model.solve_discrete()
+    return run, counter
+
+@benchmark({})
+def solve(**_):
+    model = _household()
+    counter = [0]
+    def run():
+        model.clear_cache()
+        with count_calls(model, 'calc_utility', counter):
+            model.solve()
+    return run, counter
+
+@benchmark({'n_wages': 5}, {'n_wages': 50})
+def solve_wF_vec(n_wages):
+    model = _household(wF_vec=np.linspace(0.8, 1.2, n_wages))
+    for name in ('LM_vec', 'HM_vec', 'LF_vec', 'HF_vec'):
+        setattr(model.sol, name, np.zeros(n_wages))
+    counter = [0]
+    def run():
+        model.clear_cache()
+        with count_calls(model, 'calc_utility', counter):
+            model.solve_wF_vec()
+    return run, counter
+
+@benchmark({})
+def estimate(**_):
+    model = _household()
+    counter = [0]
+    def run():
+        model.clear_cache()
+        with count_calls(model, 'calc_utility', counter):
+            model.estimate()
+    return run, counter
+
+@benchmark({'method': 'gauss-newton'}, {'method': 'L-BFGS-B'})
+def estimate_gradient(method):
+    model = _household()
+    counter = [0]
+    def run():
+        model.clear_cache()
+        with count_calls(model, 'calc_utility', counter):
+            model.estimate(method=method)
+    return run, counter
+
+
+# Benchmarks of the Solow model
+
+SOLOW_ARGS = (0.2, 0.15, 0.0, 0.015, 0.06, 1/3, 1/3)
+
+@benchmark({'num_guesses': 10}, {'num_guesses': 100})
+def multi_start(num_guesses):
+    import modelproject
+    counter = [0]
+    def run():
+        np.random.seed(0)
+        with count_calls(modelproject, 'solow_equations', counter):
+            modelproject.multi_start(num_guesses=num_guesses, fun=modelproject.solow_equations, args=SOLOW_ARGS)
+    return run, counter
+
+@benchmark({'N': 500}, {'N': 5000})
+def null_clines(N):
+    import modelproject
+    s_K, s_H, n, g, delta, alpha, varphi = SOLOW_ARGS
+    counter = [0]
+    def run():
+        with count_calls(modelproject, 'solow_equations', counter), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            modelproject.null_clines(s_K, s_H, g, n, alpha, varphi, delta, N=N)
+    return run, counter
+
+@benchmark({'n_points': 1}, {'n_points': 100_000})
+def null_cline_intersection(n_points):
+    import modelproject
+    s_K, s_H, n, g, delta, alpha, varphi = SOLOW_ARGS
+
+    # Check the scalar edge cases without a positive steady state (alpha + varphi = 1, zero savings rates) give NaN
+    for edge in ({'alpha': 0.5, 'varphi': 0.5}, {'s_K': 0.0}, {'s_H': 0.0}):
+        args = {'s_K': s_K, 's_H': s_H, 'g': g, 'n': n, 'alpha': alpha, 'varphi': varphi, 'delta': delta, **edge}
+        assert np.isnan(modelproject.null_cline_intersection(**args)).all(), f'no NaN steady state for {edge}'
+
+    # Scalar parameters for one point, otherwise random savings rates
+    rng = np.random.default_rng(0)
+    s_K, s_H = (s_K, s_H) if n_points == 1 else rng.uniform(0, 0.3, (2, n_points))
+    def run():
+        modelproject.null_cline_intersection(s_K, s_H, g, n, alpha, varphi, delta)
+    return run, None
+
+@benchmark({'T': 300}, {'T': 3000})
+def simulate_growth_paths(T):
+    import modelproject
+    s_K, s_H, n, g, delta, alpha, varphi = SOLOW_ARGS
+    def run():
+        modelproject.simulate_growth_paths(s_H, n, g, delta, alpha, varphi, s_K, T=T, shock_time=T // 3, shock_increase=0.03)
+    return run, None
+
+
+@benchmark({'N': 40}, {'N': 400})
+def phase_field(N):
+    import modelproject
+    def run():
+        modelproject.phase_field(*SOLOW_ARGS, N=N)
+    return run, None
+
+@benchmark({'n_trajectories': 100}, {'n_trajectories': 10_000})
+def trajectory_bundle(n_trajectories):
+    import modelproject
+    rng = np.random.default_rng(0)
+    k0, h0 = rng.uniform(0.5, 50, (2, n_trajectories))
+    def run():
+        modelproject.trajectory_bundle(k0, h0, *SOLOW_ARGS)
+    return run, None
+
+
+# Benchmarks of the data project
+
+@benchmark({'n_tickers': 25, 'n_dates': 37}, {'n_tickers': 500, 'n_dates': 2500})
+def calculate_portfolio_returns(n_tickers, n_dates):
+    import dataproject
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.normal(0.01, 0.05, (n_dates, n_tickers)))
+    weights = list(rng.dirichlet(np.ones(n_tickers)))
+    def run():
+        dataproject.calculate_portfolio_returns(data, weights)
+    return run, None
+
+
+@benchmark({'n_tickers': 25, 'long_only': False}, {'n_tickers': 25, 'long_only': True},
+           {'n_tickers': 500, 'long_only': False}, {'n_tickers': 500, 'long_only': True})
+def frontier(n_tickers, long_only):
+    from frontier import FrontierSolver
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0.01, 0.05, (37, n_tickers)) + rng.normal(0, 0.03, (37, 1))
+    scores = rng.uniform(0.1, 0.5, n_tickers)
+    solver = FrontierSolver(returns, scores, long_only=long_only, shrinkage=0.0 if n_tickers < 37 else 0.5)
+    targets = np.linspace(solver.mu.min(), solver.mu.max(), 50 if n_tickers < 37 else 25)
+    min_exposures = np.linspace(0.1, 0.5, 40)
+    def run():
+        solver.frontier(targets, min_exposures)
+    return run, None
+
+
+def measure(name, params, repeat=3, min_time=0.05):
+    """ Runs one benchmark and records wall time per call (best of repeat rounds), peak memory and evaluation counts per call """
+    func, _ = BENCHMARKS[name]
+    run, counter = func(**params)
+
+    # Warm up and find the number of calls per round so each round takes at least min_time
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        run()
+        number = max(1, int(min_time / max(time.perf_counter() - t0, 1e-9)))
+
+        # Time the rounds
+        times = []
+        for _ in range(repeat):
+            if counter is not None:
+                counter[0] = 0
+            t0 = time.perf_counter()
+            for _ in range(number):
+                run()
+            times.append((time.perf_counter() - t0) / number)
+
+        # Read the evaluations per call of the last round before the memory run adds to the counter
+        nfev = None if counter is None else counter[0] // number
+
+        # Measure the peak memory in a separate run (tracing slows the code down)
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {'name': name, 'params': params, 'wall': min(times), 'peak_mem': peak,
+            'nfev': nfev}
+
+
+def import_time(project, repeat=3):
+    """ Best import time of a project module in fresh interpreters and the forbidden modules it loaded """
+    code = ('import sys, time, json; t0 = time.perf_counter(); import {0}; '
+            'print(json.dumps([time.perf_counter() - t0, [m for m in {1!r} if m in sys.modules]]))').format(project, IMPORT_CHECKS[project])
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', code], cwd=os.path.join(ROOT, project), capture_output=True, text=True, check=True)
+        seconds, loaded = json.loads(out.stdout.splitlines()[-1])
+        times.append(seconds)
+    return min(times), loaded
+
+
+def check_imports(budget):
+    """ Prints the import time of each project and returns the violations of the budget and of IMPORT_CHECKS """
+    violations = []
+    for project in IMPORT_CHECKS:
+        seconds, loaded = import_time(project)
+        print(f'import {project:24s} {seconds:8.3f}s' + (f', loads {", ".join(loaded)}' if loaded else ''))
+        if seconds > budget:
+            violations.append(f'{project} takes {seconds:.3f}s to import, budget {budget:.3f}s')
+        if loaded:
+            violations.append(f'{project} loads {", ".join(loaded)} on import')
+    return violations
+
+
+def git_commit():
+    """ Current commit of the repository (None outside git) """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def result_key(result):
+    """ Key of a benchmark result in the baseline """
+    return result['name'] + json.dumps(result['params'], sort_keys=True)
+
+
+def compare(results, baseline, tolerance):
+    """ Returns the results slower or using more memory than the baseline by more than tolerance """
+    regressions = []
+    for result in results:
+        base = baseline.get(result_key(result))
+        if base is None:
+            continue
+        for metric in ('wall', 'peak_mem'):
+            if result[metric] > base[metric] * (1 + tolerance):
+                regressions.append((result_key(result), metric, base[metric], result[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', default='', help='only run benchmarks whose name contains this pattern')
+    parser.add_argument('--quick', action='store_true', help='only run the smallest problem size')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed repeats')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--compare', action='store_true', help='flag regressions against the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown, default = 0.25')
+    parser.add_argument('--check-imports', action='store_true', help='only check the import time and dependencies of each project')
+    parser.add_argument('--import-budget', type=float, default=1.0, help='allowed import time in seconds, default = 1.0')
+    args = parser.parse_args(argv)
+
+    # Check the imports instead of running the benchmarks
+    if args.check_imports:
+        violations = check_imports(args.import_budget)
+        for violation in violations:
+            print('VIOLATION', violation)
+        return 1 if violations else 0
+
+    # Run the selected benchmarks
+    meta = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': git_commit(), 'python': platform.python_version(),
+            'numpy': np.__version__, 'machine': platform.machine()}
+    results = []
+    for name, (func, params_list) in BENCHMARKS.items():
+        if args.k not in name:
+            continue
+        for params in params_list[:1] if args.quick else params_list:
+            result = {**measure(name, params, args.repeat), **meta}
+            results.append(result)
+            nfev = '' if result['nfev'] is None else f", nfev = {result['nfev']}"
+            print(f"{name:28s} {json.dumps(params):32s} wall = {result['wall']:9.4f}s, peak = {result['peak_mem']/1e6:8.2f}MB{nfev}")
+
+    # Append to the history
+    with open(HISTORY_FILE, 'a') as f:
+        for result in results:
+            f.write(json.dumps(result) + '\n')
+
+    # Store the baseline
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(BASELINE_FILE):
+            with open(BASELINE_FILE) as f:
+                baseline = json.load(f)
+        baseline.update({result_key(result): result for result in results})
+        with open(BASELINE_FILE, 'w') as f:
+            json.dump(baseline, f, indent=1)
+
+    # Compare with the baseline
+    if args.compare:
+        if not os.path.exists(BASELINE_FILE):
+            print('no baseline, run with --save-baseline first')
+            return 1
+        with open(BASELINE_FILE) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for key, metric, base, new in regressions:
+            print(f'REGRESSION {key}: {metric} {base:.4g} -> {new:.4g}')
+        if not regressions:
+            print('no regressions')
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import pandas as pd
+import numpy as np
+
+
+def normalize_rows(weights):
+    """
+    Normalizes each row of a weight matrix to one (the batch version of normalize_column)
+
+    Parameters:
+    weights       (array-like): (n_portfolios, n_tickers) matrix of weights
+
+    Returns:
+    norm_weights  (np.ndarray): Matrix where each row sums to one
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype = float))
+    return weights / weights.sum(axis = 1, keepdims = True)
+
+
+def tilted_weights(scores, tilts):
+    """
+    Creates weights proportional to scores**tilt for each tilt (tilt = 0 is equal weight, tilt = 1 is proportional)
+
+    Parameters:
+    scores        (array-like): Score for each ticker, e.g. the femaleboard share
+    tilts         (array-like): Tilts, one portfolio per tilt
+
+    Returns:
+    weights       (np.ndarray): (n_tilts, n_tickers) matrix of weights
+    """
+    scores = np.asarray(scores, dtype = float)
+    tilts = np.asarray(tilts, dtype = float)
+    return normalize_rows(scores[None, :]**tilts[:, None])
+
+
+def random_weights(n_portfolios: int, n_tickers: int, seed: int = None):
+    """
+    Draws long-only random weights uniformly from the simplex
+
+    Parameters:
+    n_portfolios         (int): Number of portfolios
+    n_tickers            (int): Number of tickers
+    seed                 (int): Seed for the random generator, (default = None)
+
+    Returns:
+    weights       (np.ndarray): (n_portfolios, n_tickers) matrix of weights
+    """
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(np.ones(n_tickers), size = n_portfolios)
+
+
+def rebalance_mask(T: int, every: int = 1):
+    """
+    Creates a boolean mask of the periods where weights are reset
+
+    Parameters:
+    T                    (int): Number of periods
+    every                (int): Rebalance every period (default = 1), every n periods, or never (None)
+
+    Returns:
+    mask          (np.ndarray): Boolean array of length T, always True in the first period
+    """
+    mask = np.zeros(T, dtype = bool)
+    mask[0] = True
+    if every is not None:
+        mask[::every] = True
+    return mask
+
+
+def portfolio_returns_batch(returns, weights, rebalance = None):
+    """
+    Calculates the return series of many portfolios as matrix products over the returns array
+
+    Parameters:
+    returns       (array-like): (T, n_tickers) array or DataFrame of stock returns, missing returns count as zero
+    weights       (array-like): (n_portfolios, n_tickers) matrix of weights
+    rebalance     (array-like): Boolean mask of length T of the periods where weights are reset to target, the portfolios
+                                always start at target in the first period, (default = None, every period as in calculate_portfolio_returns)
+
+    Returns:
+    port_r        (np.ndarray): (T, n_portfolios) array of portfolio returns
+    """
+    R = np.nan_to_num(np.asarray(returns, dtype = float), nan = 0.0)
+    W = np.atleast_2d(np.asarray(weights, dtype = float))
+
+    # With rebalancing every period the weights are constant
+    if rebalance is None or np.all(rebalance):
+        return R @ W.T
+
+    # Start at the target weights in the first period (on a copy of the mask), as in rebalance_mask
+    rebalance = np.array(rebalance, dtype = bool)
+    rebalance[0] = True
+
+    # Split the periods into blocks starting at each rebalance
+    starts = np.flatnonzero(rebalance)
+    ends = np.append(starts[1:], len(R))
+    port_r = np.empty((len(R), len(W)))
+
+    for start, end in zip(starts, ends):
+        # Growth of each stock since the rebalance, including the rebalancing period
+        growth = np.cumprod(1 + R[start:end], axis = 0)
+
+        # Value of each portfolio relative to its value before the rebalance
+        value = growth @ W.T
+
+        # Portfolio returns from the drifting values
+        port_r[start] = value[0] - 1
+        port_r[start+1:end] = value[1:] / value[:-1] - 1
+
+    return port_r
+
+
+def backtest(returns, weights, rebalance = None, chunk: int = 1024, return_series: bool = False):
+    """
+    Evaluates many portfolios at once and summarizes each by its mean, standard deviation, cumulative return and maximum drawdown
+
+    Parameters:
+    returns       (array-like): (T, n_tickers) array or DataFrame of stock returns
+    weights       (array-like): (n_portfolios, n_tickers) matrix of weights
+    rebalance     (array-like): Boolean mask of length T of rebalancing periods, (default = None, every period)
+    chunk                (int): Number of portfolios evaluated at once, (default = 1024)
+    return_series       (bool): Also return the (T, n_portfolios) return series, (default = False)
+
+    Returns:
+    stats       (pd.DataFrame): DataFrame with one row per portfolio
+    port_r        (np.ndarray): (T, n_portfolios) array of portfolio returns, only if return_series
+    """
+    W = np.atleast_2d(np.asarray(weights, dtype = float))
+    n = len(W)
+
+    # Create arrays to store the statistics
+    mean = np.empty(n)
+    std = np.empty(n)
+    cumulative = np.empty(n)
+    max_drawdown = np.empty(n)
+    port_r = np.empty((len(returns), n)) if return_series else None
+
+    # Evaluate the portfolios in chunks to bound memory
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        r = portfolio_returns_batch(returns, W[start:stop], rebalance)
+
+        # Calculate cumulative returns and drawdowns
+        cum_r = np.cumprod(1 + r, axis = 0)
+        drawdown = cum_r / np.maximum.accumulate(cum_r, axis = 0) - 1
+
+        # Save the statistics
+        mean[start:stop] = r.mean(axis = 0)
+        std[start:stop] = r.std(axis = 0, ddof = 1)
+        cumulative[start:stop] = cum_r[-1]
+        max_drawdown[start:stop] = drawdown.min(axis = 0)
+
+        if return_series:
+            port_r[:, start:stop] = r
+
+    stats = pd.DataFrame({'mean': mean, 'std': std, 'cumulative': cumulative, 'max_drawdown': max_drawdown})
+
+    if return_series:
+        return stats, port_r
+    return stats
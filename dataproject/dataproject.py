@@ -1,20 +1,28 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from adjustText import adjust_text
-import seaborn as sns
+from pricestore import PriceStore
 
-def calculate_returns(data: pd.DataFrame):
+# Plotting helpers in plotting.py, imported on first use so the numerical functions load without matplotlib
+_PLOTTING = ('cum_ret_plot', 'plot_scatter_with_labels', 'CumRetPlot')
+
+def calculate_returns(data: pd.DataFrame, start: str = None, end: str = None, tickers: list = None):
     """
     Calculates the monthly and cumulative returns for a DataFrame of stock prices
 
     Parameters:
-    data       (pd.DataFrame): DataFrame of stock prices
+    data       (pd.DataFrame): DataFrame of stock prices, or a PriceStore to read the prices from
+    start               (str): First date read from a PriceStore, (default = None)
+    end                 (str): Date read up to from a PriceStore, (default = None)
+    tickers            (list): Tickers read from a PriceStore, (default = all)
 
     Returns:
     data_r     (pd.DataFrame): DataFrame of stock returns
     data_cr    (pd.DataFrame): DataFrame of cumulative stock returns
     """
+    # Read the prices in the date range if a PriceStore is given
+    if isinstance(data, PriceStore):
+        data = data.read(tickers, start, end)
+
     # Calculate monthly returns using the pct_change() function
     data_r = data.pct_change()
 
@@ -25,18 +33,25 @@ def calculate_returns(data: pd.DataFrame):
     return data_r, data_cr
 
 
-def calculate_portfolio_returns(data: pd.DataFrame, weights: pd.DataFrame):
+def calculate_portfolio_returns(data: pd.DataFrame, weights: pd.DataFrame, start: str = None, end: str = None, tickers: list = None):
     """
     Calculates portfolio and cumulative returns based on returns and weights for each stock
 
     Parameters:
-    data        (pd.DataFrame): DataFrame of stock returns
+    data        (pd.DataFrame): DataFrame of stock returns, or a PriceStore to read the prices from
     weights     (pd.DataFrame): DataFrame of weights for each stock
+    start                (str): First date read from a PriceStore, (default = None)
+    end                  (str): Date read up to from a PriceStore, (default = None)
+    tickers             (list): Tickers read from a PriceStore in the order of the weights, (default = all)
 
     Returns:
     port_r         (pd.Series): Series of portfolio returns
     cum_port_r     (pd.Series): Series of cumulative portfolio returns
     """
+    # Read the prices in the date range and calculate returns if a PriceStore is given
+    if isinstance(data, PriceStore):
+        data, _ = calculate_returns(data, start, end, tickers)
+
     # Calculate weighted returns
     weighted_r = data * weights
 
@@ -50,66 +65,6 @@ def calculate_portfolio_returns(data: pd.DataFrame, weights: pd.DataFrame):
     return port_r, cum_port_r
 
 
-def cum_ret_plot(data: pd.DataFrame, stock: str, ref: str, fig: int = 1, ax_data: pd.DataFrame = None):
-    """
-    Plots the cumulative return of a stock against a reference 'index'
-
-    Parameters:
-    data        (pd.DataFrame): DataFrame of cumulative stock returns
-    stock                (str): Which stock to plot
-    ref                  (str): Reference/Index
-    fig                  (int): Figure no. in title, (defualt = 1)
-    ax_data     (pd.DataFrame): Only used for non-interactive plots, (default = None).
-
-    Returns:
-    A plot of a stocks cumulative return compared to a reference/index
-    """
-    # If ax_data is None, set it to the input data for an interactive plot
-    if ax_data is None:
-        ax_data = data
-
-    # Plot the specified stock using ax_data
-    ax = ax_data.plot(y = stock)
-
-    # Plot the reference 'index' on the same axes (by specifying ax=ax)
-    data.plot(y = ref, ax = ax, 
-              title = f'Figure {fig}: Cumulative Return of {stock} compared to {ref}',
-              ylabel = 'Cumulative Return')
-
-
-
-def plot_scatter_with_labels(ax: plt.Axes, x: list, y: list, labels: list, title: str, xlabel: str, ylabel: str):
-    """
-    Plots a scatter-plot with automatically adjusted labels for each point, a trend line and labels for the title and axes
-
-    Parameters:
-    ax          (plt.Axes): The Axes object to draw the plot onto
-    x               (list): List of x-axis values
-    y               (list): List of y-axis values
-    labels          (list): List of labels for the data points
-    title            (str): The title for the graph
-    xlabel           (str): The label for the x-axis
-    ylabel           (str): The label for the y-axis
-
-    Returns:
-    A scatter-plot with automatically adjusted labels for each point, a trend line and labels for the title and axes
-    """
-    # Create the scatter plot with a trend line
-    ax.scatter(x, y)
-    sns.regplot(x = x, y = y, scatter = False, ax = ax)
-
-    # Add labels to each data point using ax.text in a for loop
-    texts = [ax.text(x_pos, y_pos, lab, fontsize = 8, ha = 'center') for x_pos, y_pos, lab in zip(x, y, labels)]
-
-    # Automatically adjust the labels to avoid overlapping using adjust_text
-    adjust_text(texts, arrowprops=dict(arrowstyle = '-', color = 'k', lw = 0.5), ax = ax)
-
-    # Set the title and labels for the axes
-    ax.set_title(title, fontsize = 12)
-    ax.set_xlabel(xlabel, fontsize = 12)
-    ax.set_ylabel(ylabel, fontsize = 12)
-
-
 def normalize_column(col: pd.Series):
     """
     Normalizes a column to one
@@ -127,4 +82,20 @@ def normalize_column(col: pd.Series):
     norm_col = col / col_sum
 
     # Return the normalized column
-    return norm_col
\ No newline at end of file
+    return norm_col
+
+
+def __getattr__(name: str):
+    """
+    Imports the plotting helpers on first access, so dp.plot_scatter_with_labels etc. keep working
+
+    Parameters:
+    name                 (str): Attribute name
+
+    Returns:
+    The plotting helper from plotting.py
+    """
+    if name in _PLOTTING:
+        import plotting
+        return getattr(plotting, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
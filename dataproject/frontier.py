@@ -0,0 +1,365 @@
+import pandas as pd
+import numpy as np
+from scipy import linalg
+
+
+def board_scores(C25F: pd.DataFrame, tickers: list, column: str = 'femaleboard'):
+    """
+    Looks up the share of female board members for each ticker
+
+    Parameters:
+    C25F        (pd.DataFrame): DataFrame as in C25F.csv with the columns yfinanceticker and femaleboard (in percent)
+    tickers             (list): Tickers in the column order of the returns
+    column               (str): Column with the scores, (default = 'femaleboard')
+
+    Returns:
+    scores        (np.ndarray): Share of female board members (between 0 and 1) for each ticker
+    """
+    return C25F.set_index('yfinanceticker').loc[list(tickers), column].to_numpy(dtype = float) / 100
+
+
+class FrontierSolver:
+    """
+    Solves batches of mean-variance problems
+
+        min w' Sigma w   s.t.   sum(w) = 1,   mu' w = target,   scores' w >= min_exposure   (and w >= 0 if long_only)
+
+    The covariance is built and factorized once. Without short-sale constraints every problem has a closed form from the factorization.
+    With them, each problem is solved exactly by a dual active set method warm started from its neighbour on the grid.
+
+    Parameters:
+    returns     (pd.DataFrame): DataFrame (or array) of monthly stock returns, rows with missing returns are dropped
+    scores        (array-like): Exposure score of each ticker, e.g. the femaleboard share from board_scores
+    long_only           (bool): Restrict weights to be non-negative, (default = True)
+    shrinkage          (float): Weight on the diagonal in the covariance (needed when there are more tickers than months), (default = 0)
+    """
+
+    def __init__(self, returns, scores, long_only: bool = True, shrinkage: float = 0.0):
+        R = np.asarray(returns, dtype = float)
+        R = R[~np.isnan(R).any(axis = 1)]
+        self.tickers = list(returns.columns) if isinstance(returns, pd.DataFrame) else None
+        self.long_only = long_only
+
+        # Build the mean returns and the (shrunk) covariance once
+        self.mu = R.mean(axis = 0)
+        S = np.cov(R, rowvar = False)
+        self.Sigma = (1 - shrinkage) * S + shrinkage * np.diag(np.diag(S))
+        self.scores = np.asarray(scores, dtype = float)
+        n = self.mu.size
+
+        # Factorize the covariance once and solve for the constraint directions
+        try:
+            self.chol = linalg.cho_factor(self.Sigma)
+        except linalg.LinAlgError:
+            raise ValueError('the covariance is not positive definite, use shrinkage > 0 (e.g. with more tickers than months)')
+        self.A = np.vstack([np.ones(n), self.mu, self.scores])
+        self.X = linalg.cho_solve(self.chol, self.A.T)
+        self.M = self.A @ self.X
+
+        # Curvatures of the inequality normals in the inverse covariance, used to detect dependent constraints
+        self.S_diag = np.diag(linalg.cho_solve(self.chol, np.eye(n)))
+        self.S_scores = self.scores @ self.X[:, 2]
+
+    def frontier(self, targets, min_exposures = None):
+        """
+        Solves the problems on the grid of target returns and minimum exposures
+
+        Parameters:
+        targets       (array-like): Target returns
+        min_exposures (array-like): Minimum exposures, (default = None, no exposure constraint)
+
+        Returns:
+        stats       (pd.DataFrame): DataFrame with one row per problem: target, min_exposure, mean, std, exposure and success
+        weights       (np.ndarray): (n_problems, n_tickers) matrix of weights, NaN for infeasible problems
+        """
+        targets = np.atleast_1d(np.asarray(targets, dtype = float))
+        min_exposures = np.array([-np.inf]) if min_exposures is None else np.atleast_1d(np.asarray(min_exposures, dtype = float))
+
+        # Order the grid as a snake (exposures forth and back for each target) so consecutive problems are neighbours,
+        # the optimal weights change less along the exposures so there are fewer active set changes between neighbours
+        E, T = np.meshgrid(min_exposures, targets)
+        E[1::2] = E[1::2, ::-1]
+        T, E = T.ravel(), E.ravel()
+
+        # Solve all problems
+        W, success = self.solve(T, E)
+
+        # Summarize each portfolio
+        stats = pd.DataFrame({'target': T, 'min_exposure': E, 'mean': W @ self.mu,
+                              'std': np.sqrt(np.sum((W @ self.Sigma) * W, axis = 1)),
+                              'exposure': W @ self.scores, 'success': success})
+
+        return stats, W
+
+    def solve(self, targets, min_exposures):
+        """
+        Solves the problems with the closed form (long_only = False) or the dual active set method (long_only = True)
+
+        Parameters:
+        targets       (np.ndarray): Target return of each problem
+        min_exposures (np.ndarray): Minimum exposure of each problem
+
+        Returns:
+        W             (np.ndarray): (n_problems, n_tickers) matrix of weights
+        success       (np.ndarray): Whether each problem was solved
+        """
+        targets = np.asarray(targets, dtype = float)
+        min_exposures = np.broadcast_to(np.asarray(min_exposures, dtype = float), targets.shape)
+        if self.long_only:
+            return self.solve_long_only(targets, min_exposures)
+        return self.solve_long_short(targets, min_exposures), np.ones(targets.size, dtype = bool)
+
+    def solve_long_short(self, targets, min_exposures):
+        """
+        Solves the problems without short-sale constraints in closed form
+
+        Parameters:
+        targets       (np.ndarray): Target return of each problem
+        min_exposures (np.ndarray): Minimum exposure of each problem
+
+        Returns:
+        W             (np.ndarray): (n_problems, n_tickers) matrix of weights
+        """
+        # Solve with the budget and return constraints only
+        B2 = np.vstack([np.ones_like(targets), targets])
+        W = (self.X[:, :2] @ np.linalg.solve(self.M[:2, :2], B2)).T
+
+        # Where the exposure constraint is violated it binds, so solve with it as an equality
+        bind = W @ self.scores < min_exposures
+        if bind.any():
+            B3 = np.vstack([np.ones(bind.sum()), targets[bind], min_exposures[bind]])
+            W[bind] = (self.X @ np.linalg.solve(self.M, B3)).T
+
+        return W
+
+    def solve_long_only(self, targets, min_exposures, tol: float = 1e-10, max_iter: int = 10_000):
+        """
+        Solves the problems with short-sale constraints exactly by the dual active set method of Goldfarb and Idnani.
+        The problems are solved in order and each starts from the active set of the previous one, so neighbouring problems take few steps.
+        The Cholesky factor of the free weights' covariance is carried along and updated by one row or column per active set change.
+
+        Parameters:
+        targets       (np.ndarray): Target return of each problem (consecutive problems should be close)
+        min_exposures (np.ndarray): Minimum exposure of each problem
+        tol                (float): Tolerance on the constraint violations, (default = 1e-10)
+        max_iter             (int): Maximum number of active set changes per problem, (default = 10_000)
+
+        Returns:
+        W             (np.ndarray): (n_problems, n_tickers) matrix of weights (NaN where infeasible)
+        success       (np.ndarray): Whether each problem was solved
+        """
+        n = self.mu.size
+        W = np.full((targets.size, n), np.nan)
+        success = np.zeros(targets.size, dtype = bool)
+
+        # Skip the infeasible problems, where the exposure exceeds the most attainable at the target return
+        feasible = min_exposures <= self.max_exposure(targets) + tol
+
+        # Start the first problem with the weights that are negative in the long-short solution at their bounds
+        W_ls = self.solve_long_short(targets, min_exposures)
+        active = None
+
+        # Solve the problems in order, warm starting from the previous active set and its factor
+        for j in np.flatnonzero(feasible):
+            if active is None:
+                active = (_FreeCholesky(self.Sigma, W_ls[j] >= 0), False)
+            w, active = self._dual_active_set(targets[j], min_exposures[j], *active, tol, max_iter)
+            if w is not None:
+                W[j] = w
+                success[j] = True
+
+        return W, success
+
+    def max_exposure(self, targets):
+        """
+        Calculates the highest exposure of long-only portfolios with each target return, the upper concave envelope of (mu, scores)
+
+        Parameters:
+        targets       (np.ndarray): Target returns
+
+        Returns:
+        max_exp       (np.ndarray): Highest attainable exposure (-inf outside the range of mean returns)
+        """
+        # Upper hull of the points sorted by mean return (for equal means the highest score is kept)
+        order = np.lexsort((-self.scores, self.mu))
+        hull = []
+        for i in order:
+            if hull and self.mu[hull[-1]] == self.mu[i]:
+                continue
+            while len(hull) >= 2:
+                a, b = hull[-2], hull[-1]
+                # Remove b if it lies below the line from a to i
+                if (self.scores[b] - self.scores[a]) * (self.mu[i] - self.mu[a]) <= (self.scores[i] - self.scores[a]) * (self.mu[b] - self.mu[a]):
+                    hull.pop()
+                else:
+                    break
+            hull.append(i)
+
+        # Interpolate along the hull
+        max_exp = np.interp(targets, self.mu[hull], self.scores[hull])
+        max_exp[(targets < self.mu.min()) | (targets > self.mu.max())] = -np.inf
+        return max_exp
+
+    def _dual_active_set(self, target, min_exposure, free, exposure, tol, max_iter):
+        """
+        Minimizes w' Sigma w subject to sum(w) = 1, mu' w = target, scores' w >= min_exposure and w >= 0 by the Goldfarb-Idnani
+        dual method. Weights at their bounds are eliminated, and the Cholesky factor of the covariance of the free weights is
+        updated as weights are bound or released, so each step solves the KKT system through a Schur complement in O(k^2).
+
+        Parameters:
+        target             (float): Target return
+        min_exposure       (float): Minimum exposure
+        free      (_FreeCholesky): Factor of the free weights to start from (updated in place)
+        exposure            (bool): Start with the exposure constraint binding
+        tol                (float): Tolerance on the constraint violations
+        max_iter             (int): Maximum number of active set changes
+
+        Returns:
+        w             (np.ndarray): Optimal weights (None if infeasible or not converged)
+        active             (tuple): Factor of the free weights and whether the exposure constraint binds, at the optimum
+        """
+        Sigma, A, n = self.Sigma, self.A, self.mu.size
+        b = np.array([1.0, target, min_exposure])
+        bound = free.bound
+
+        # Start from the optimum with the given constraints binding, releasing the bound with the most negative multiplier until none are left
+        while True:
+            try:
+                w_F, v = free.solve_kkt(A[:3 if exposure else 2], np.zeros(len(free.F)), b[:3 if exposure else 2])
+            except np.linalg.LinAlgError:
+                free.reset(np.ones(n, dtype = bool))
+                exposure = False
+                continue
+            w = np.zeros(n)
+            w[free.F] = w_F
+            u_g = -v
+            u_b = np.where(bound, w_F @ Sigma[free.F] - A[:u_g.size].T @ u_g, 0.0)
+            negative = bound & (u_b < 0)
+            if exposure and u_g[2] < 0:
+                exposure = False
+            elif negative.any():
+                free.add(int(np.argmin(u_b)))
+            else:
+                break
+
+        for _ in range(max_iter):
+            # Choose the most violated inequality, stop if none
+            slack = np.where(bound, np.inf, w)
+            slack_e = np.inf if exposure else self.scores @ w - min_exposure
+            p = int(np.argmin(slack))
+            if min(slack[p], slack_e) >= -tol:
+                return w, (free, exposure)
+            add_exposure = slack_e < slack[p]
+            if add_exposure:
+                normal = self.scores
+            else:
+                normal = np.zeros(n)
+                normal[p] = 1.0
+            normal_S_normal = self.S_scores if add_exposure else self.S_diag[p]
+            u_p = 0.0
+
+            # Add p, releasing binding inequalities whose multipliers reach zero on the way
+            while True:
+                # Primal and dual directions: Sigma z = normal - N r and N' z = 0 for the binding constraints N
+                z_F, r_g = free.solve_kkt(A[:3 if exposure else 2], normal[free.F], np.zeros(3 if exposure else 2))
+                z = np.zeros(n)
+                z[free.F] = z_F
+                r_b = np.where(bound, normal - z_F @ Sigma[free.F] - A[:r_g.size].T @ r_g, 0.0)
+
+                # Largest dual step before a binding inequality's multiplier reaches zero
+                ratio_b = np.where(bound & (r_b > 0), u_b / np.where(r_b > 0, r_b, 1.0), np.inf)
+                l = int(np.argmin(ratio_b))
+                t1 = ratio_b[l]
+                t1_e = u_g[2] / r_g[2] if exposure and r_g[2] > 0 else np.inf
+
+                # Step which satisfies constraint p (none if it is linearly dependent on the binding constraints)
+                zc = z @ normal
+                violation = (self.scores @ w - min_exposure) if add_exposure else w[p]
+                t2 = -violation / zc if zc > 1e-10 * normal_S_normal else np.inf
+
+                # Infeasible problem
+                t = min(t1, t1_e, t2)
+                if np.isinf(t):
+                    return None, (free, exposure)
+
+                # Take the step
+                w = w + t * z
+                u_g = u_g - t * r_g
+                u_b = u_b - t * r_b
+                u_p += t
+
+                # Add p after a full step, otherwise release the constraint whose multiplier reached zero
+                if t2 <= min(t1, t1_e):
+                    if add_exposure:
+                        exposure = True
+                        u_g = np.r_[u_g, u_p]
+                    else:
+                        free.drop(p)
+                        w[p] = 0.0
+                        u_b[p] = u_p
+                    break
+                if t1_e <= t1:
+                    exposure = False
+                    u_g = u_g[:2]
+                else:
+                    free.add(l)
+                    u_b[l] = 0.0
+
+        return None, (free, exposure)
+
+
+class _FreeCholesky:
+    """
+    Cholesky factor L of the covariance of the free weights, Sigma[F][:, F] = L L', updated when a weight is released (added to F)
+    or bound (dropped from F) instead of factorized again
+
+    Parameters:
+    Sigma         (np.ndarray): Covariance matrix
+    free          (np.ndarray): Boolean mask of the free weights
+    """
+
+    def __init__(self, Sigma, free):
+        self.Sigma = Sigma
+        self.bound = np.ones(Sigma.shape[0], dtype = bool)
+        self.reset(free)
+
+    def reset(self, free):
+        """ Factorize the covariance of the free weights from scratch (the mask bound is updated in place) """
+        self.F = np.flatnonzero(free)
+        self.bound[:] = ~np.asarray(free, dtype = bool)
+        self.L = np.linalg.cholesky(self.Sigma[np.ix_(self.F, self.F)]) if self.F.size else np.zeros((0, 0))
+
+    def add(self, j):
+        """ Release weight j by appending a row to L """
+        k = self.F.size
+        l = linalg.lapack.dtrtrs(self.L, self.Sigma[self.F, j], lower = 1)[0] if k else np.zeros(0)
+        L = np.zeros((k + 1, k + 1))
+        L[:k, :k] = self.L
+        L[k, :k] = l
+        L[k, k] = np.sqrt(max(self.Sigma[j, j] - l @ l, 1e-300))
+        self.L, self.F = L, np.append(self.F, j)
+        self.bound[j] = False
+
+    def drop(self, j):
+        """ Bind weight j by deleting its row and column, which updates the trailing block by the deleted column (rank one) """
+        i = int(np.flatnonzero(self.F == j)[0])
+        k = self.F.size
+        L = np.zeros((k - 1, k - 1))
+        L[:i, :i] = self.L[:i, :i]
+        L[i:, :i] = self.L[i+1:, :i]
+        if i < k - 1:
+            L33, l32 = self.L[i+1:, i+1:], self.L[i+1:, i:i+1]
+            L[i:, i:] = linalg.lapack.dpotrf(L33 @ L33.T + l32 @ l32.T, lower = 1, clean = 1)[0]
+        self.L, self.F = L, np.r_[self.F[:i], self.F[i+1:]]
+        self.bound[j] = True
+
+    def solve_kkt(self, A, rhs_F, rhs_g):
+        """ Solves [Sigma_FF, A_F'; A_F, 0] [x; v] = [rhs_F; rhs_g] through the Schur complement A_F Sigma_FF^-1 A_F' """
+        A_F = A[:, self.F]
+        if self.F.size < A.shape[0]:
+            raise np.linalg.LinAlgError('fewer free weights than binding constraints')
+        X = linalg.lapack.dpotrs(self.L, np.column_stack([rhs_F, A_F.T]), lower = 1)[0]
+        _, _, v, info = linalg.lapack.dgesv(A_F @ X[:, 1:], A_F @ X[:, 0] - rhs_g)
+        if info > 0:
+            raise np.linalg.LinAlgError('the binding constraints are linearly dependent on the free weights')
+        return X[:, 0] - X[:, 1:] @ v, v
@@ -0,0 +1,156 @@
+import hashlib
+
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.patches import FancyArrowPatch
+
+# Cache of label positions and regression fits keyed on the plotted data
+_plot_cache = {}
+
+def cum_ret_plot(data: pd.DataFrame, stock: str, ref: str, fig: int = 1, ax_data: pd.DataFrame = None):
+    """
+    Plots the cumulative return of a stock against a reference 'index'
+
+    Parameters:
+    data        (pd.DataFrame): DataFrame of cumulative stock returns
+    stock                (str): Which stock to plot
+    ref                  (str): Reference/Index
+    fig                  (int): Figure no. in title, (defualt = 1)
+    ax_data     (pd.DataFrame): Only used for non-interactive plots, (default = None).
+
+    Returns:
+    A plot of a stocks cumulative return compared to a reference/index
+    """
+    # If ax_data is None, set it to the input data for an interactive plot
+    if ax_data is None:
+        ax_data = data
+
+    # Plot the specified stock using ax_data
+    ax = ax_data.plot(y = stock)
+
+    # Plot the reference 'index' on the same axes (by specifying ax=ax)
+    data.plot(y = ref, ax = ax, 
+              title = f'Figure {fig}: Cumulative Return of {stock} compared to {ref}',
+              ylabel = 'Cumulative Return')
+
+
+
+def plot_scatter_with_labels(ax: plt.Axes, x: list, y: list, labels: list, title: str, xlabel: str, ylabel: str,
+                             fast: bool = False, cache: bool = True):
+    """
+    Plots a scatter-plot with automatically adjusted labels for each point, a trend line and labels for the title and axes
+
+    Parameters:
+    ax          (plt.Axes): The Axes object to draw the plot onto
+    x               (list): List of x-axis values
+    y               (list): List of y-axis values
+    labels          (list): List of labels for the data points
+    title            (str): The title for the graph
+    xlabel           (str): The label for the x-axis
+    ylabel           (str): The label for the y-axis
+    fast            (bool): Draw a closed-form OLS line without the bootstrapped confidence band, (default = False)
+    cache           (bool): Reuse label positions and fits computed for the same data and figure size, (default = True)
+
+    Returns:
+    A scatter-plot with automatically adjusted labels for each point, a trend line and labels for the title and axes
+    """
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    labels = [str(lab) for lab in labels]
+
+    # Key the cache on the data, the labels and the figure size
+    key = _plot_key(x, y, labels, tuple(ax.figure.get_size_inches()))
+    cached = _plot_cache.get(key) if cache else None
+
+    # Create the scatter plot with a trend line
+    ax.scatter(x, y)
+    if fast:
+        # Closed-form OLS line over the range of x
+        slope, intercept = cached['fit'] if cached is not None else np.polyfit(x, y, 1)
+        x_line = np.array([x.min(), x.max()])
+        ax.plot(x_line, intercept + slope * x_line)
+    else:
+        import seaborn as sns
+        sns.regplot(x = x, y = y, scatter = False, ax = ax)
+        slope, intercept = np.polyfit(x, y, 1)
+
+    if cached is not None:
+        # Place the labels at the cached positions and draw the arrows as adjust_text does
+        for x_pos, y_pos, lab, pos in zip(x, y, labels, cached['positions']):
+            text = ax.text(pos[0], pos[1], lab, fontsize = 8, ha = 'center', va = 'center')
+            if pos != (x_pos, y_pos):
+                ax.add_patch(FancyArrowPatch(posA = pos, posB = (x_pos, y_pos), patchA = text, transform = ax.transData,
+                                             arrowstyle = '-', color = 'k', lw = 0.5))
+    else:
+        from adjustText import adjust_text
+
+        # Add labels to each data point using ax.text in a for loop
+        texts = [ax.text(x_pos, y_pos, lab, fontsize = 8, ha = 'center') for x_pos, y_pos, lab in zip(x, y, labels)]
+
+        # Automatically adjust the labels to avoid overlapping using adjust_text
+        adjust_text(texts, arrowprops=dict(arrowstyle = '-', color = 'k', lw = 0.5), ax = ax)
+
+        # Store the label positions and the fit
+        if cache:
+            _plot_cache[key] = {'positions': [tuple(map(float, text.get_position())) for text in texts],
+                                'fit': (slope, intercept)}
+
+    # Set the title and labels for the axes
+    ax.set_title(title, fontsize = 12)
+    ax.set_xlabel(xlabel, fontsize = 12)
+    ax.set_ylabel(ylabel, fontsize = 12)
+
+
+def _plot_key(*items):
+    """ Hash of arrays and other values used as key in the plot cache """
+    h = hashlib.sha1()
+    for item in items:
+        h.update(item.tobytes() if isinstance(item, np.ndarray) else repr(item).encode())
+    return h.hexdigest()
+
+
+class CumRetPlot:
+    """
+    Cumulative return plot which updates the data of its existing lines when another stock is selected
+
+    Parameters:
+    data        (pd.DataFrame): DataFrame of cumulative stock returns
+    ref                  (str): Reference/Index
+    fig                  (int): Figure no. in title, (defualt = 1)
+    """
+
+    def __init__(self, data: pd.DataFrame, ref: str, fig: int = 1):
+        self.data = data
+        self.ref = ref
+        self.fig_no = fig
+
+        # Create the figure once with a line for the stock and a line for the reference
+        self.fig, self.ax = plt.subplots()
+        x = np.arange(len(data))
+        self.stock_line, = self.ax.plot(x, data[ref].to_numpy(dtype = float))
+        self.ref_line, = self.ax.plot(x, data[ref].to_numpy(dtype = float), label = ref)
+
+        # Use the dates as tick labels
+        self.ax.set_xticks(x[::max(1, len(x) // 6)], data.index[::max(1, len(x) // 6)])
+        self.ax.set_ylabel('Cumulative Return')
+
+    def update(self, stock: str):
+        """
+        Shows the cumulative return of a stock by changing the data of the existing line
+
+        Parameters:
+        stock                (str): Which stock to plot
+        """
+        # Update line data, label and title
+        self.stock_line.set_ydata(self.data[stock].to_numpy(dtype = float))
+        self.stock_line.set_label(stock)
+        self.ax.set_title(f'Figure {self.fig_no}: Cumulative Return of {stock} compared to {self.ref}')
+        self.ax.legend()
+
+        # Rescale the y-axis to the new data and redraw
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.fig.canvas.draw_idle()
+
+        return self.fig
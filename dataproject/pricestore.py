@@ -0,0 +1,183 @@
+import os
+import json
+
+import pandas as pd
+import numpy as np
+
+
+def yfinance_fetcher(tickers: list, start: str, end: str, interval: str = '1mo'):
+    """
+    Downloads adjusted close prices with yfinance (imported on first use)
+
+    Parameters:
+    tickers             (list): List of yfinance tickers
+    start                (str): First date to download
+    end                  (str): Date to download up to
+    interval             (str): Sampling interval, (default = '1mo')
+
+    Returns:
+    prices      (pd.DataFrame): DataFrame of prices with dates as index and tickers as columns
+    """
+    import yfinance as yf
+
+    # Download historical market data and keep the adjusted close
+    prices = yf.download(tickers = tickers, start = start, end = end, interval = interval, auto_adjust = False)['Adj Close']
+
+    # Return a DataFrame even when only one ticker is downloaded
+    if isinstance(prices, pd.Series):
+        prices = prices.to_frame(name = tickers[0])
+
+    return prices
+
+
+def share_classes(frame: pd.DataFrame, ticker: str = 'yfinanceticker', company: str = 'company'):
+    """
+    Maps each ticker to its company, so share classes of one company (MAERSK-A.CO and MAERSK-B.CO) can be read once
+
+    Parameters:
+    frame       (pd.DataFrame): DataFrame with a ticker and a company column such as C25F.csv
+    ticker               (str): Name of the ticker column, (default = 'yfinanceticker')
+    company              (str): Name of the company column, (default = 'company')
+
+    Returns:
+    companies           (dict): Company of each ticker
+    """
+    return dict(zip(frame[ticker], frame[company]))
+
+
+class PriceStore:
+    """
+    Local columnar price store with one memory-mapped NumPy file per ticker
+
+    Parameters:
+    path                 (str): Directory of the store, created if missing
+    fetcher         (callable): Function fetcher(tickers, start, end) returning a DataFrame of prices, (default = yfinance_fetcher)
+    companies           (dict): Company of each ticker (see share_classes), only the first listed share class of a company is fetched and read, (default = None)
+    """
+
+    # Record type of each ticker file
+    dtype = np.dtype([('date', 'M8[D]'), ('price', 'f8')])
+
+    def __init__(self, path: str, fetcher = yfinance_fetcher, companies: dict = None):
+        self.path = path
+        self.fetcher = fetcher
+        self.companies = {} if companies is None else dict(companies)
+        os.makedirs(path, exist_ok = True)
+
+    def _unique(self, tickers: list):
+        """ Tickers without duplicates, keeping the first share class of each company (tickers without a company are their own) """
+        first = {}
+        for ticker in tickers:
+            first.setdefault(self.companies.get(ticker, ticker), ticker)
+        return list(first.values())
+
+    def _file(self, ticker: str):
+        """ File name of a ticker (tickers such as ^OMXC25 are escaped) """
+        return os.path.join(self.path, ticker.replace('^', '_caret_').replace('/', '_slash_') + '.npy')
+
+    def tickers(self):
+        """ List of tickers in the store """
+        index_file = os.path.join(self.path, 'tickers.json')
+        if not os.path.exists(index_file):
+            return []
+        with open(index_file) as f:
+            return json.load(f)
+
+    def _load(self, ticker: str):
+        """ Memory-map the records of a ticker (empty if missing) """
+        file = self._file(ticker)
+        if not os.path.exists(file):
+            return np.empty(0, dtype = self.dtype)
+        return np.load(file, mmap_mode = 'r')
+
+    def last_date(self, ticker: str):
+        """ Last stored date of a ticker (None if missing) """
+        records = self._load(ticker)
+        return records['date'][-1] if records.size > 0 else None
+
+    def append(self, prices: pd.DataFrame):
+        """
+        Appends prices to the store, new values replace stored values on the same date
+
+        Parameters:
+        prices      (pd.DataFrame): DataFrame of prices with dates as index and tickers as columns
+        """
+        dates = pd.to_datetime(prices.index).values.astype('M8[D]')
+        tickers = self.tickers()
+
+        for ticker in prices.columns:
+            # Drop missing prices
+            values = prices[ticker].to_numpy(dtype = float)
+            I = ~np.isnan(values)
+            new = np.empty(I.sum(), dtype = self.dtype)
+            new['date'] = dates[I]
+            new['price'] = values[I]
+
+            # Merge with the stored records, keeping the last value for each date
+            records = np.concatenate([np.array(self._load(ticker)), new])
+            _, idx = np.unique(records['date'][::-1], return_index = True)
+            records = records[::-1][idx]
+
+            # Write the merged records
+            np.save(self._file(ticker), records)
+            if ticker not in tickers:
+                tickers.append(ticker)
+
+        # Update the list of tickers
+        with open(os.path.join(self.path, 'tickers.json'), 'w') as f:
+            json.dump(tickers, f)
+
+    def update(self, tickers: list, start: str, end: str):
+        """
+        Fetches only the dates after each ticker's last stored date and appends them
+
+        Parameters:
+        tickers             (list): List of tickers
+        start                (str): First date for tickers not yet in the store
+        end                  (str): Date to fetch up to
+        """
+        # Group tickers by the first date to fetch
+        groups = {}
+        for ticker in self._unique(tickers):
+            last = self.last_date(ticker)
+            first = pd.Timestamp(start) if last is None else pd.Timestamp(last) + pd.Timedelta(days = 1)
+            if first < pd.Timestamp(end):
+                groups.setdefault(first, []).append(ticker)
+
+        # Fetch and append each group
+        for first, group in groups.items():
+            prices = self.fetcher(group, first.strftime('%Y-%m-%d'), end)
+            if len(prices) > 0:
+                self.append(prices)
+
+    def read(self, tickers: list = None, start: str = None, end: str = None):
+        """
+        Reads prices lazily by date range, duplicate tickers and share classes of one company are read once
+
+        Parameters:
+        tickers             (list): List of tickers, (default = all tickers in the store)
+        start                (str): First date (inclusive), (default = None)
+        end                  (str): Last date (exclusive as in yf.download), (default = None)
+
+        Returns:
+        prices      (pd.DataFrame): DataFrame of prices with dates as index and tickers as columns
+        """
+        tickers = self.tickers() if tickers is None else self._unique(tickers)
+
+        columns = {}
+        for ticker in tickers:
+            records = self._load(ticker)
+
+            # Find the date range with binary search on the memory-mapped dates
+            lo = 0 if start is None else np.searchsorted(records['date'], np.datetime64(start, 'D'), side = 'left')
+            hi = records.size if end is None else np.searchsorted(records['date'], np.datetime64(end, 'D'), side = 'left')
+
+            # Only the slice in the range is read from disk
+            chunk = records[lo:hi]
+            columns[ticker] = pd.Series(chunk['price'], index = pd.DatetimeIndex(chunk['date']))
+
+        # Align tickers on dates
+        prices = pd.DataFrame(columns, columns = tickers)
+        prices.index.name = 'Date'
+
+        return prices
@@ -0,0 +1,99 @@
+import pandas as pd
+import numpy as np
+
+# Statistics along the last axis of rolling_stats
+ROLLING_STATS = ('mean', 'std', 'beta', 'corr')
+
+
+def _window_sums(x, window):
+    """ Rolling (or expanding if window is None) sums along the first axis from cumulative sums, O(1) per step """
+    S = np.cumsum(x, axis = 0)
+    if window is None:
+        return S
+    out = S.copy()
+    out[window:] = S[window:] - S[:-window]
+    return out
+
+
+def rolling_stats(returns: pd.DataFrame, window: int = None, market: str = '^OMXC25', min_periods: int = None):
+    """
+    Calculates rolling (or expanding) means, standard deviations, betas and correlations against the market for all tickers in one pass
+
+    Parameters:
+    returns     (pd.DataFrame): DataFrame of stock returns, including the market column
+    window               (int): Window length, (default = None, expanding window)
+    market               (str): Market column used for betas and correlations, (default = '^OMXC25')
+    min_periods          (int): Minimum number of observations in a window, (default = window, or 2 for expanding)
+
+    Returns:
+    stats         (np.ndarray): (time, ticker, statistic) array with tickers in the column order of returns and statistics in ROLLING_STATS
+    """
+    X = returns.to_numpy(dtype = float)
+    m = returns[market].to_numpy(dtype = float)[:, None]
+
+    # Set the minimum number of observations
+    if min_periods is None:
+        min_periods = 2 if window is None else window
+
+    # Center the data by the full-sample means so differences of cumulative sums keep their precision
+    x_center = np.nanmean(X, axis = 0)
+    m_center = np.nanmean(m, axis = 0)
+    X = X - x_center
+    m = m - m_center
+
+    # Observations of each ticker and observations where both the ticker and the market are available
+    valid = ~np.isnan(X)
+    pair = valid & ~np.isnan(m)
+    Xv = np.where(valid, X, 0.0)
+    Xp = np.where(pair, X, 0.0)
+    Mp = np.where(pair, m, 0.0)
+
+    # Rolling counts and sums
+    n = _window_sums(valid.astype(float), window)
+    n_p = _window_sums(pair.astype(float), window)
+    s_x = _window_sums(Xv, window)
+    s_xx = _window_sums(Xv**2, window)
+    s_xp = _window_sums(Xp, window)
+    s_xxp = _window_sums(Xp**2, window)
+    s_mp = _window_sums(Mp, window)
+    s_mmp = _window_sums(Mp**2, window)
+    s_xmp = _window_sums(Xp * Mp, window)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        # Means and standard deviations (ddof = 1)
+        mean = s_x / n
+        var = np.fmax(s_xx - n * mean**2, 0.0) / (n - 1)
+
+        # Covariances with the market on pairwise-available observations
+        mean_xp = s_xp / n_p
+        mean_mp = s_mp / n_p
+        cov = (s_xmp - n_p * mean_xp * mean_mp) / (n_p - 1)
+        var_xp = np.fmax(s_xxp - n_p * mean_xp**2, 0.0) / (n_p - 1)
+        var_mp = np.fmax(s_mmp - n_p * mean_mp**2, 0.0) / (n_p - 1)
+
+        beta = cov / var_mp
+        corr = cov / np.sqrt(var_xp * var_mp)
+
+    # Stack the statistics and add back the means
+    stats = np.stack([mean + x_center, np.sqrt(var), beta, corr], axis = -1)
+
+    # Set windows with too few observations to NaN
+    stats[n < min_periods, :2] = np.nan
+    stats[n_p < min_periods, 2:] = np.nan
+
+    return stats
+
+
+def rolling_stats_sweep(returns: pd.DataFrame, windows: list, market: str = '^OMXC25'):
+    """
+    Calculates rolling_stats for many window lengths
+
+    Parameters:
+    returns     (pd.DataFrame): DataFrame of stock returns, including the market column
+    windows             (list): Window lengths (None for expanding)
+    market               (str): Market column used for betas and correlations, (default = '^OMXC25')
+
+    Returns:
+    stats         (np.ndarray): (window, time, ticker, statistic) array
+    """
+    return np.stack([rolling_stats(returns, window, market) for window in windows])
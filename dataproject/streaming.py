@@ -0,0 +1,98 @@
+import pandas as pd
+import numpy as np
+
+
+class StreamingReturns:
+    """
+    Updates returns, cumulative returns and portfolio returns chunk by chunk with O(n_tickers) state
+
+    Parameters:
+    tickers             (list): Tickers in the order of the price columns
+    weights       (array-like): Portfolio weights for each ticker, (default = None, no portfolio)
+    """
+
+    def __init__(self, tickers: list, weights = None):
+        self.tickers = list(tickers)
+        self.weights = None if weights is None else np.asarray(weights, dtype = float)
+
+        # State carried between chunks
+        self.last_price = np.full(len(self.tickers), np.nan)
+        self.cum = np.ones(len(self.tickers))
+        self.cum_port = 1.0
+
+    def update(self, prices: pd.DataFrame):
+        """
+        Processes the next block of dates
+
+        Parameters:
+        prices      (pd.DataFrame): DataFrame of stock prices for the next dates
+
+        Returns:
+        data_r      (pd.DataFrame): DataFrame of stock returns
+        data_cr     (pd.DataFrame): DataFrame of cumulative stock returns
+        port_r         (pd.Series): Series of portfolio returns (None without weights)
+        cum_port_r     (pd.Series): Series of cumulative portfolio returns (None without weights)
+        """
+        P = prices[self.tickers].to_numpy(dtype = float)
+
+        # Calculate returns against the previous price (the last price of the previous chunk for the first row)
+        prev = np.vstack([self.last_price, P[:-1]])
+        r = P / prev - 1
+
+        # Calculate cumulative returns continuing from the state, missing returns are skipped as in cumprod()
+        missing = np.isnan(r)
+        running = np.cumprod(np.vstack([self.cum, np.where(missing, 1.0, 1 + r)]), axis = 0)
+        cr = np.where(missing, np.nan, running[1:])
+
+        # Update the state
+        if len(P) > 0:
+            self.last_price = P[-1]
+            self.cum = running[-1]
+
+        data_r = pd.DataFrame(r, index = prices.index, columns = self.tickers)
+        data_cr = pd.DataFrame(cr, index = prices.index, columns = self.tickers)
+
+        # Without weights only the stock returns are calculated
+        if self.weights is None:
+            return data_r, data_cr, None, None
+
+        # Calculate portfolio returns row by row without materializing the weighted returns
+        port = np.where(missing, 0.0, r) @ self.weights
+        cum_port = np.cumprod(np.concatenate([[self.cum_port], 1 + port]))[1:]
+        if len(port) > 0:
+            self.cum_port = cum_port[-1]
+
+        port_r = pd.Series(port, index = prices.index)
+        cum_port_r = pd.Series(cum_port, index = prices.index)
+
+        return data_r, data_cr, port_r, cum_port_r
+
+
+def stream_returns(chunks, tickers: list, weights = None):
+    """
+    Runs StreamingReturns over an iterable of price chunks and concatenates the outputs
+
+    Parameters:
+    chunks          (iterable): Iterable of DataFrames of stock prices in date order
+    tickers             (list): Tickers in the order of the price columns
+    weights       (array-like): Portfolio weights for each ticker, (default = None)
+
+    Returns:
+    data_r      (pd.DataFrame): DataFrame of stock returns
+    data_cr     (pd.DataFrame): DataFrame of cumulative stock returns
+    port_r         (pd.Series): Series of portfolio returns (None without weights)
+    cum_port_r     (pd.Series): Series of cumulative portfolio returns (None without weights)
+    """
+    engine = StreamingReturns(tickers, weights)
+    outputs = [engine.update(chunk) for chunk in chunks]
+
+    data_r = pd.concat([out[0] for out in outputs])
+    data_cr = pd.concat([out[1] for out in outputs])
+
+    if weights is None:
+        return data_r, data_cr, None, None
+
+    port_r = pd.concat([out[2] for out in outputs])
+    cum_port_r = pd.concat([out[3] for out in outputs])
+
+    return data_r, data_cr, port_r, cum_port_r
@@ -0,0 +1,141 @@
+import os
+import json
+import hashlib
+import inspect
+
+import numpy as np
+
+# Directory of cached expressions and generated code
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__symcache__')
+
+
+def cached_derivation(derive, cache_dir=CACHE_DIR, load_exprs=True):
+    """
+    Runs a sympy derivation once and caches the expressions and the generated NumPy code on disk
+
+    Args:
+        derive (function): Function without arguments returning (args, exprs), a tuple of sympy symbols and an expression or tuple of expressions
+        cache_dir   (str): Directory of the cache, default = CACHE_DIR
+        load_exprs (bool): Return the sympy expressions, default = True (False avoids importing sympy when the cache exists)
+
+    Returns:
+        The expressions (None if not loaded) and a NumPy callable f(*args) (returning a tuple if exprs is a tuple)
+    """
+    # Key the cache on the source of the module defining the derivation (including helpers it calls), so a cache hit needs no sympy
+    source = inspect.getsource(inspect.getmodule(derive))
+    key = hashlib.sha256(source.encode()).hexdigest()[:16]
+    file = os.path.join(cache_dir, f'{derive.__name__}_{key}.json')
+
+    # Load the generated code and, if requested, the expressions (derived again if they were stored by another sympy version)
+    cached = None
+    if os.path.exists(file):
+        with open(file) as f:
+            cached = json.load(f)
+        exprs = None
+        if load_exprs:
+            import sympy as sm
+            if cached.get('sympy') == sm.__version__:
+                exprs = sm.sympify(cached['exprs'])
+            else:
+                cached = None
+
+    if cached is None:
+        import sympy as sm
+
+        # Run the symbolic derivation and generate code with common subexpression elimination
+        args, exprs = derive()
+        func = sm.lambdify(args, exprs, modules='numpy', cse=True)
+        cached = {'exprs': sm.srepr(exprs), 'code': inspect.getsource(func), 'sympy': sm.__version__}
+
+        # Store the expressions, the code and the sympy version which generated them
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(file, 'w') as f:
+            json.dump(cached, f)
+    code = cached['code']
+
+    # Compile the generated code in a NumPy namespace
+    namespace = {name: getattr(np, name) for name in dir(np) if not name.startswith('_')}
+    exec(code, namespace)
+    func = namespace['_lambdifygenerated']
+
+    return exprs, func
+
+
+def derive_optimal_labor():
+    """ Optimal labor supply L*(alpha, kappa, nu, tau, w) from the first order condition """
+    import sympy as sm
+
+    # Create SymPy symbols for the variables and parameters
+    C, G, L, alpha, nu, kappa, tau, w = sm.symbols('C, G, L, alpha, nu, kappa, tau, w')
+
+    # Set the utility function with consumption from net wages
+    utility_func = sm.log(C**alpha * G**(1-alpha)) - nu * L**2 / 2
+    utility_func = utility_func.subs(C, kappa + (1 - tau) * w * L)
+
+    # Solve the first order condition for L and keep the positive root
+    roots = sm.solve(sm.diff(utility_func, L), L)
+    test = {alpha: 0.5, kappa: 1, nu: 0.01, tau: 0.3, w: 1}
+    optimal_labor = [root for root in roots if root.subs(test) > 0][0]
+
+    return (alpha, kappa, nu, tau, w), optimal_labor
+
+
+def derive_implied_L_G_V():
+    """ Implied optimal labor, government consumption and utility (L*, G, V) as functions of (alpha, kappa, nu, tau, w) """
+    import sympy as sm
+
+    args, L_star = derive_optimal_labor()
+    alpha, kappa, nu, tau, w = args
+
+    # Calculate goverment consumption, private consumption and utility
+    G = tau * w * L_star
+    C = kappa + (1 - tau) * w * L_star
+    V = sm.log(C**alpha * G**(1 - alpha)) - nu * L_star**2 / 2
+
+    return args, (L_star, G, V)
+
+
+def optimal_labor_func(alpha, kappa, nu, tau, w):
+    """
+    Optimal labor supply, vectorized over NumPy arrays
+
+    Args:
+        alpha (float or array): Weight on private consumption
+        kappa (float or array): Free private consumption
+        nu    (float or array): Disutility of labor scaling factor
+        tau   (float or array): Labor income tax rate
+        w     (float or array): Wage
+
+    Returns:
+        Optimal labor supply
+    """
+    return _function('optimal_labor')(alpha, kappa, nu, tau, w)
+
+
+def implied_L_G_V(alpha, kappa, nu, tau, w):
+    """
+    Implied optimal labor, government consumption and utility, vectorized over NumPy arrays (e.g. a grid of tax rates)
+
+    Args:
+        alpha (float or array): Weight on private consumption
+        kappa (float or array): Free private consumption
+        nu    (float or array): Disutility of labor scaling factor
+        tau   (float or array): Labor income tax rate
+        w     (float or array): Wage
+
+    Returns:
+        L_star, G and V
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _function('implied_L_G_V')(alpha, kappa, nu, tau, w)
+
+
+# Loaded callables (the cache is read on first use)
+_FUNCTIONS = {}
+_DERIVATIONS = {'optimal_labor': derive_optimal_labor, 'implied_L_G_V': derive_implied_L_G_V}
+
+def _function(name):
+    """ Loads the callable of a derivation on first use """
+    if name not in _FUNCTIONS:
+        _FUNCTIONS[name] = cached_derivation(_DERIVATIONS[name], load_exprs=False)[1]
+    return _FUNCTIONS[name]
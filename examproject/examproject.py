@@ -0,0 +1,246 @@
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor
+import time
+
+import numpy as np
+from scipy import optimize
+
+
+def demand_shocks(rho, sigma, t, K, rng=None):
+    """
+    Draws K AR(1) paths of the demand shock kappa at once
+
+    Args:
+        rho                  (float): Persistence of log kappa
+        sigma                (float): Standard deviation of the shocks
+        t                      (int): Number of months
+        K                      (int): Number of shock series
+        rng   (np.random.Generator): Random generator, default = None (the global np.random state as in the notebook)
+
+    Returns:
+        (K, t) array of kappa with log kappa = 0 in the first month
+    """
+    # Use the global random state unless a generator is given
+    rng = np.random if rng is None else rng
+
+    # Draw all shocks at once (row k equals the k'th call of demand_shock in the notebook)
+    epsilon = rng.normal(-0.5 * sigma**2, sigma, size=(K, t))
+
+    # Calculate log kappa forward in time for all series together
+    log_kappa = np.zeros((K, t))
+    for i in range(1, t):
+        log_kappa[:, i] = rho * log_kappa[:, i-1] + epsilon[:, i]
+
+    # Return kappa instead of log_kappa
+    return np.exp(log_kappa)
+
+
+def ex_post_values(kappa, eta, w, R, iota, delta):
+    """
+    Calculates the ex post value h of each shock series for each delta under the delta-adjustment policy
+
+    Args:
+        kappa    (array): (K, t) array of demand shocks
+        eta      (float): Elasticity parameter of the production function
+        w        (float): Wage
+        R        (float): Monthly discount factor
+        iota     (float): Adjustment cost
+        delta    (array): Vector of policy thresholds, l only adjusts when |l_{t-1} - l*_t| > delta (delta = 0 is the plain policy)
+
+    Returns:
+        (n_delta, K) array of h
+    """
+    delta = np.atleast_1d(np.asarray(delta, dtype=float))[:, None]
+    K, t = kappa.shape
+
+    # Labor is zero in the first month and the first month has no profits
+    l_prev = np.zeros((delta.shape[0], K))
+    h = np.zeros((delta.shape[0], K))
+
+    for i in range(1, t):
+        # Calculate l_star for all series
+        l_star = (((1 - eta) * kappa[:, i]) / w)**(1 / eta)
+
+        # Apply the policy condition to all series and deltas at once
+        l = np.where(np.abs(l_prev - l_star) > delta, l_star, l_prev)
+
+        # Add discounted profits, paying iota when labor changes
+        h += R**(-i) * (kappa[:, i] * l**(1-eta) - w * l - iota * (l != l_prev))
+
+        l_prev = l
+
+    # As in the notebook, month 0 is compared with the last month (l[-1]), so iota is paid if l ends above zero
+    h -= iota * (l_prev != 0)
+
+    return h
+
+
+def ante_values(rho, sigma, eta, w, R, iota, t, K, delta, rng=None, chunk=10_000):
+    """
+    Calculates the ex ante value H for a vector of deltas with common random numbers
+
+    Args:
+        rho                  (float): Persistence of log kappa
+        sigma                (float): Standard deviation of the shocks
+        eta                  (float): Elasticity parameter of the production function
+        w                    (float): Wage
+        R                    (float): Monthly discount factor
+        iota                 (float): Adjustment cost
+        t                      (int): Number of months
+        K                      (int): Number of shock series
+        delta       (float or array): Policy threshold(s)
+        rng   (np.random.Generator): Random generator, default = None (the global np.random state as in the notebook)
+        chunk                  (int): Number of shock series simulated at once, default = 10_000
+
+    Returns:
+        Array of H for each delta (a float if delta is a float)
+    """
+    scalar = np.ndim(delta) == 0
+    delta = np.atleast_1d(np.asarray(delta, dtype=float))
+
+    # Sum h over chunks of shock series to bound memory, every delta sees the same shocks
+    h_sum = np.zeros(delta.size)
+    for start in range(0, K, chunk):
+        kappa = demand_shocks(rho, sigma, t, min(chunk, K - start), rng=rng)
+        h_sum += ex_post_values(kappa, eta, w, R, iota, delta).sum(axis=1)
+
+    # Calculate mean of h
+    H = h_sum / K
+
+    return H[0] if scalar else H
+
+
+def griewank(x):
+    """
+    Griewank function, vectorized over leading axes
+
+    Args:
+        x (array): Points with the coordinates along the last axis
+
+    Returns:
+        Function values
+    """
+    x = np.asarray(x, dtype=float)
+    i = np.arange(1, x.shape[-1] + 1)
+
+    A = np.sum(x**2 / 4000, axis=-1)
+    B = np.prod(np.cos(x / np.sqrt(i)), axis=-1)
+    return A - B + 1
+
+
+def griewank_grad(x):
+    """
+    Analytic gradient of the Griewank function, vectorized over leading axes
+
+    Args:
+        x (array): Points with the coordinates along the last axis
+
+    Returns:
+        Gradients with the same shape as x
+    """
+    x = np.asarray(x, dtype=float)
+    sqrt_i = np.sqrt(np.arange(1, x.shape[-1] + 1))
+    c = np.cos(x / sqrt_i)
+
+    # Product of the cosines of all other coordinates
+    others = np.stack([np.prod(np.delete(c, j, axis=-1), axis=-1) for j in range(x.shape[-1])], axis=-1)
+
+    return x / 2000 + np.sin(x / sqrt_i) / sqrt_i * others
+
+
+def refined_multi_start(tol=1e-8, bounds=(-600, 600), K_=10, K=1000, seed=100, legacy=False, analytic_grad=True):
+    """
+    Refined multi-start optimization of the Griewank function with its own random stream
+
+    Args:
+        tol            (float): Tolerance of the optimizer and for stopping early, default = 1e-8
+        bounds         (tuple): Bounds for the initial guesses, default = (-600, 600)
+        K_               (int): Number of warm-up iterations, default = 10
+        K                (int): Maximum number of iterations, default = 1000
+        seed             (int): Seed of the random stream, default = 100
+        legacy          (bool): Use np.random.RandomState(seed) which reproduces the notebook's np.random.seed, default = False
+        analytic_grad   (bool): Give BFGS the analytic gradient, default = True (False reproduces the notebook)
+
+    Returns:
+        SimpleNamespace with x_star, fx_star, k (last iteration), x_k0s, nfev and time
+    """
+    # Create the random stream
+    rng = np.random.RandomState(seed) if legacy else np.random.default_rng(seed)
+    jac = griewank_grad if analytic_grad else None
+
+    # Set initial solutions
+    x_star = np.nan
+    fx_star = np.inf
+    x_k0s = []
+    nfev = 0
+
+    t0 = time.perf_counter()
+    for k in range(K):
+        # Draw two random numbers within bounds
+        x_k = rng.uniform(bounds[0], bounds[1], 2)
+
+        # Use x_k during warm-up and afterwards a weighted average with the best solution
+        if k < K_:
+            x_k0 = x_k
+        else:
+            chi_k = 0.50 * (2 / (1+np.exp((k - K_) / 100)))
+            x_k0 = chi_k * x_k + (1 - chi_k) * x_star
+
+        x_k0s.append(x_k0)
+
+        # Optimize the Griewank function for x_k0
+        sol = optimize.minimize(fun = griewank, x0 = x_k0, jac = jac, method = 'BFGS', tol = tol)
+        nfev += sol.nfev
+
+        # Check if the current solution is better than the previous solution
+        if k == 0 or sol.fun < fx_star:
+            x_star = sol.x
+            fx_star = sol.fun
+
+        # Stop if solution is less than tolerance
+        if fx_star < tol:
+            break
+
+    res = SimpleNamespace()
+    res.x_star = x_star
+    res.fx_star = fx_star
+    res.k = k
+    res.x_k0s = np.array(x_k0s)
+    res.nfev = nfev
+    res.time = time.perf_counter() - t0
+    res.seed = seed
+    res.K_ = K_
+
+    return res
+
+
+def _refined_multi_start_task(kwargs):
+    """ Runs refined_multi_start with keyword arguments in a worker process """
+    return refined_multi_start(**kwargs)
+
+
+def convergence_study(seeds=range(30), K_s=(10, 100), workers=None, **kwargs):
+    """
+    Runs refined_multi_start for each seed and warm-up setting, optionally in a process pool
+
+    Args:
+        seeds   (iterable): Seeds, one independent random stream each, default = range(30)
+        K_s        (tuple): Warm-up iterations to compare, default = (10, 100)
+        workers      (int): Number of processes, default = None (serial)
+        **kwargs          : Further arguments to refined_multi_start
+
+    Returns:
+        Dictionary from K_ to the list of results (in the order of seeds), results equal the serial ones
+    """
+    # Create one task per seed and warm-up setting
+    tasks = [dict(kwargs, K_=K_, seed=seed) for K_ in K_s for seed in seeds]
+
+    # Run serially or in a process pool
+    if workers is None or workers <= 1:
+        results = list(map(_refined_multi_start_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_refined_multi_start_task, tasks))
+
+    # Group the results by warm-up setting
+    return {K_: [res for res in results if res.K_ == K_] for K_ in K_s}
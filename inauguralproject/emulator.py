@@ -0,0 +1,245 @@
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import optimize
+from scipy.interpolate import RectBivariateSpline
+
+from inauguralproject import HouseholdSpecializationModelClass, copy_model
+
+# Parameters which are shares in (0,1), gridded uniformly in log-odds since the moments change quickly near the bounds
+SHARE_NAMES = ('alpha',)
+
+class MomentEmulatorClass:
+
+    def __init__(self,model=None,names=('alpha','sigma'),bounds=((0.5, 0.99), (0.01, 0.33)),fixed=None):
+        """ Setup emulator of the map from two parameters to (beta0,beta1) """
+
+        # Use a default model unless one is given
+        self.model = HouseholdSpecializationModelClass() if model is None else model
+
+        # Set the emulated parameters, their bounds and the fixed parameters
+        self.names = tuple(names)
+        self.bounds = np.array(bounds,dtype=float)
+        self.fixed = {} if fixed is None else dict(fixed)
+
+        # Create list of grids (the first is global, later ones are local refinements)
+        self.patches = []
+
+    def solve_grid(self,x_grid,y_grid,workers=None):
+        """ Calculate (beta0,beta1) on a tensor grid, rows are solved in parallel """
+
+        # Set parameters with the fixed values
+        par = copy_model(self.model.par).par
+        for name, value in self.fixed.items():
+            setattr(par,name,value)
+
+        # Create one task per grid row
+        tasks = [np.column_stack((np.full(y_grid.size,x),y_grid)) for x in x_grid]
+
+        # Solve serially or in a process pool
+        args = ([par]*len(tasks),[self.names]*len(tasks),tasks)
+        if workers is None or workers <= 1:
+            rows = list(map(_moments_block,*args))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rows = list(pool.map(_moments_block,*args))
+
+        # Stack to arrays of shape (x_grid.size,y_grid.size)
+        moments = np.stack(rows)
+        return moments[:,:,0], moments[:,:,1]
+
+    def add_patch(self,x_grid,y_grid,beta0,beta1):
+        """ Fit interpolating splines to gridded moments and store them """
+
+        patch = SimpleNamespace()
+        patch.x_grid = x_grid
+        patch.y_grid = y_grid
+        patch.beta0 = beta0
+        patch.beta1 = beta1
+
+        # Fit cubic splines (lower the degree for small grids)
+        kx = min(3,x_grid.size-1)
+        ky = min(3,y_grid.size-1)
+        patch.spline0 = RectBivariateSpline(x_grid,y_grid,beta0,kx=kx,ky=ky)
+        patch.spline1 = RectBivariateSpline(x_grid,y_grid,beta1,kx=kx,ky=ky)
+
+        self.patches.append(patch)
+
+    def build(self,n=(21,21),workers=None):
+        """ Precompute (beta0,beta1) on a grid over the bounds """
+
+        # Create the grids
+        x_grid = self.grid(0,n[0])
+        y_grid = self.grid(1,n[1])
+
+        # Solve the model on the grid and fit the splines
+        beta0, beta1 = self.solve_grid(x_grid,y_grid,workers=workers)
+        self.patches = []
+        self.add_patch(x_grid,y_grid,beta0,beta1)
+
+    def grid(self,k,n):
+        """ Grid of n points over the bounds of the k'th parameter (uniform in log-odds for shares) """
+
+        low, high = self.bounds[k]
+        if self.names[k] in SHARE_NAMES and 0 < low < high < 1:
+            return 1/(1+np.exp(-np.linspace(np.log(low/(1-low)),np.log(high/(1-high)),n)))
+        return np.linspace(low,high,n)
+
+    def interior(self,x,inset=0.1):
+        """ Start point moved inside the bounds and a Nelder-Mead simplex pointing into the interior """
+
+        # Move the start a small fraction of the width away from the bounds
+        low, high = self.bounds[:,0], self.bounds[:,1]
+        width = high-low
+        x = np.clip(np.asarray(x,dtype=float),low+1e-3*width,high-1e-3*width)
+
+        # Step a fraction of the width along each axis, towards the middle of the bounds
+        step = np.where(x < (low+high)/2,1.0,-1.0)*inset*width
+        return x, np.vstack([x,x+np.diag(step)])
+
+    def refine(self,center,width,n=(11,11),workers=None):
+        """ Add a finer local grid around center with the given half-widths """
+
+        # Create local grids clipped to the bounds
+        center = np.asarray(center,dtype=float)
+        width = np.broadcast_to(np.asarray(width,dtype=float),(2,))
+        low = np.fmax(center-width,self.bounds[:,0])
+        high = np.fmin(center+width,self.bounds[:,1])
+        x_grid = np.linspace(low[0],high[0],n[0])
+        y_grid = np.linspace(low[1],high[1],n[1])
+
+        # Solve the model on the local grid and fit the splines
+        beta0, beta1 = self.solve_grid(x_grid,y_grid,workers=workers)
+        self.add_patch(x_grid,y_grid,beta0,beta1)
+
+    def moments(self,x,y):
+        """ Interpolated (beta0,beta1) at points (x,y), arrays broadcast """
+
+        # Broadcast inputs
+        x, y = np.broadcast_arrays(np.asarray(x,dtype=float),np.asarray(y,dtype=float))
+        beta0 = np.full(x.shape,np.nan)
+        beta1 = np.full(x.shape,np.nan)
+
+        # Evaluate each patch where it applies, later (finer) patches overwrite earlier ones
+        for patch in self.patches:
+            I = ((x >= patch.x_grid[0]) & (x <= patch.x_grid[-1]) & (y >= patch.y_grid[0]) & (y <= patch.y_grid[-1]))
+            if I.any():
+                beta0[I] = patch.spline0.ev(x[I],y[I])
+                beta1[I] = patch.spline1.ev(x[I],y[I])
+
+        return beta0, beta1
+
+    def calc_loss(self,x,y):
+        """ Squared moment residuals from the interpolated moments """
+
+        # Access the model's targets
+        par = self.model.par
+
+        beta0, beta1 = self.moments(x,y)
+        return (par.beta0_target - beta0)**2 + (par.beta1_target - beta1)**2
+
+    def estimate(self,polish=True,refine=False,workers=None,n_starts=3):
+        """ Estimate on the emulator from the best n_starts grid points and optionally polish with the exact solver """
+
+        # Access the model's parameter and solution objects
+        par = self.model.par
+        sol = self.model.sol
+
+        # Start from the best points on the global grid
+        patch = self.patches[0]
+        loss = self.calc_loss(patch.x_grid[:,None],patch.y_grid[None,:])
+        best = np.argsort(np.where(np.isnan(loss),np.inf,loss),axis=None)[:n_starts]
+        initial_guesses = [[patch.x_grid[i],patch.y_grid[j]] for i, j in zip(*np.unravel_index(best,loss.shape))]
+
+        # Refine the emulator around the grid optimum (with the width of the neighbouring grid cells)
+        if refine:
+            i, j = np.unravel_index(best[0],loss.shape)
+            width = [np.diff(patch.x_grid[max(i-2,0):i+3]).sum()/2,np.diff(patch.y_grid[max(j-2,0):j+3]).sum()/2]
+            self.refine(initial_guesses[0],width,workers=workers)
+
+        # Find the solutions on the emulator from each start inside the bounds and keep the best
+        solution = None
+        for initial_guess in initial_guesses:
+            x0, simplex = self.interior(initial_guess)
+            candidate = optimize.minimize(fun = lambda x: self.calc_loss(x[0],x[1]), x0 = x0, method = 'Nelder-Mead',
+                                          bounds = self.bounds, options = {'initial_simplex': simplex})
+            if solution is None or candidate.fun < solution.fun:
+                solution = candidate
+
+        res = SimpleNamespace()
+        res.x_emulator = solution.x
+        res.fun_emulator = solution.fun
+
+        # Set the fixed parameters
+        for name, value in self.fixed.items():
+            setattr(par,name,value)
+
+        # Polish with the exact solver from the emulator's optimum, with a small simplex inside the bounds and
+        # tolerances below the size of the emulator's loss (the default fatol = 1e-4 stops at once)
+        if polish:
+            x0, simplex = self.interior(solution.x,inset=0.01)
+            solution = optimize.minimize(fun = self.model.calc_loss, x0 = x0, args = (self.names,), method = 'Nelder-Mead',
+                                         bounds = self.bounds, options = {'initial_simplex': simplex, 'xatol': 1e-6, 'fatol': 1e-14})
+
+        # Re-solve at the estimate so par and sol are consistent
+        res.x = solution.x
+        res.fun = self.model.calc_loss(solution.x,self.names)
+        res.nfev = solution.nfev if polish else 0
+
+        # Save the estimates
+        for name, value in {**self.fixed,**dict(zip(self.names,res.x))}.items():
+            setattr(sol,name,value)
+
+        return res
+
+    def save(self,filename):
+        """ Save the gridded moments to a compressed array file """
+
+        arrays = {'names': np.array(self.names), 'bounds': self.bounds,
+                  'fixed_names': np.array(list(self.fixed.keys()),dtype=str),
+                  'fixed_values': np.array(list(self.fixed.values()),dtype=float)}
+
+        for k, patch in enumerate(self.patches):
+            arrays[f'x_grid_{k}'] = patch.x_grid
+            arrays[f'y_grid_{k}'] = patch.y_grid
+            arrays[f'beta0_{k}'] = patch.beta0.astype(np.float32)
+            arrays[f'beta1_{k}'] = patch.beta1.astype(np.float32)
+
+        np.savez_compressed(filename,**arrays)
+
+    def load(self,filename):
+        """ Load gridded moments from an array file and refit the splines """
+
+        with np.load(filename) as data:
+
+            # Check that the file emulates the same parameters
+            if tuple(data['names']) != self.names:
+                raise ValueError(f'{filename} emulates {tuple(data["names"])}, not {self.names}')
+
+            self.bounds = data['bounds']
+            self.fixed = dict(zip(data['fixed_names'].tolist(),data['fixed_values'].tolist()))
+
+            # Refit the splines for each stored grid
+            self.patches = []
+            k = 0
+            while f'x_grid_{k}' in data:
+                self.add_patch(data[f'x_grid_{k}'],data[f'y_grid_{k}'],
+                               data[f'beta0_{k}'].astype(float),data[f'beta1_{k}'].astype(float))
+                k += 1
+
+
+def _moments_block(par,names,X):
+    """ Calculate (beta0,beta1) for each row of parameter values on an independent model copy """
+
+    # Create an independent model
+    model = copy_model(par)
+
+    # Create array to store the moments
+    moments = np.empty((X.shape[0],2))
+
+    for i, x in enumerate(X):
+        model.calc_loss(x,names)
+        moments[i] = model.sol.beta0, model.sol.beta1
+
+    return moments
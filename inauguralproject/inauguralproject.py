@@ -1,11 +1,77 @@
 
 from types import SimpleNamespace
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+import pickle
+import time
+import warnings
 
 import numpy as np
 from scipy import optimize
-import pandas as pd 
-import matplotlib.pyplot as plt
-import warnings
+
+# Make the instrumentation module shared by the projects importable
+SHARED_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared')
+if SHARED_DIR not in sys.path:
+    sys.path.append(SHARED_DIR)
+
+import jts_instrument as instrument
+
+# Parameters which determine the household's optimal choices (used as the solution cache key)
+CACHE_FIELDS = ('rho','nu','epsilon','omega','kappa','alpha','sigma','wM','wF')
+
+# Structured array types for batches of parameter records and their solutions
+PAR_DTYPE = np.dtype([(name,'f8') for name in CACHE_FIELDS])
+SOL_DTYPE = np.dtype([('LM','f8'),('HM','f8'),('LF','f8'),('HF','f8'),('utility','f8'),('success','?')])
+
+class ParRecord:
+    """ Immutable parameter record with the fields in CACHE_FIELDS """
+
+    __slots__ = CACHE_FIELDS
+
+    def __init__(self,**values):
+        """ Setup record, all fields in CACHE_FIELDS are required """
+
+        for name in CACHE_FIELDS:
+            object.__setattr__(self,name,float(values[name]))
+
+    def __setattr__(self,name,value):
+        raise AttributeError('ParRecord is immutable, use replace()')
+
+    def __repr__(self):
+        return 'ParRecord(' + ', '.join(f'{name}={getattr(self,name)}' for name in CACHE_FIELDS) + ')'
+
+    def __eq__(self,other):
+        if not isinstance(other,ParRecord):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def __reduce__(self):
+        """ Pickle and copy through the constructor, since setting attributes raises """
+
+        return (_make_record,(self._values(),))
+
+    def _values(self):
+        """ Tuple of the fields in CACHE_FIELDS """
+
+        return tuple(getattr(self,name) for name in CACHE_FIELDS)
+
+    @classmethod
+    def from_par(cls,par):
+        """ Create record from a parameter namespace or a row of a PAR_DTYPE array """
+
+        if isinstance(par,np.void):
+            return cls(**{name: par[name] for name in CACHE_FIELDS})
+        return cls(**{name: getattr(par,name) for name in CACHE_FIELDS})
+
+    def replace(self,**values):
+        """ Create a new record with some fields changed """
+
+        return ParRecord(**{**{name: getattr(self,name) for name in CACHE_FIELDS},**values})
 
 class HouseholdSpecializationModelClass:
 
@@ -34,6 +100,13 @@ class HouseholdSpecializationModelClass:
         par.wF = 1.0
         par.wF_vec = np.linspace(0.8,1.2,5)
 
+        # Set discrete grid (step in hours) and max number of choices evaluated at once
+        par.discrete_step = 0.5
+        par.discrete_chunk = 2**18
+
+        # Set max number of cached solutions
+        par.cache_size = 10_000
+
         # Set targets
         par.beta0_target = 0.4
         par.beta1_target = -0.1
@@ -47,19 +120,96 @@ class HouseholdSpecializationModelClass:
         sol.beta0 = np.nan
         sol.beta1 = np.nan
 
-    def calc_utility(self,LM,HM,LF,HF):
-        """ calculate utility """
+        # Create solution cache (least recently used entries are evicted first)
+        self.cache = SimpleNamespace(store=OrderedDict(),hits=0,misses=0)
+
+    def cache_key(self,method):
+        """ Create cache key from the solver method and all relevant parameters """
+
+        # Access class's parameter object
+        par = self.par
+
+        # Include the grid resolution for the discrete solver
+        extra = (par.discrete_step,) if method.startswith('solve_discrete') else ()
+
+        return (method,) + tuple(float(getattr(par,name)) for name in CACHE_FIELDS) + extra
+
+    def cache_get(self,key):
+        """ Look up a cached solution, returns None if missing """
+
+        # Access the cache
+        cache = self.cache
+
+        # Count misses
+        if key not in cache.store:
+            cache.misses += 1
+            instrument.count('cache_misses')
+            return None
+
+        # Count hits and mark as most recently used
+        cache.hits += 1
+        instrument.count('cache_hits')
+        cache.store.move_to_end(key)
+
+        return SimpleNamespace(**cache.store[key])
+
+    def cache_put(self,key,opt):
+        """ Store a solution in the cache and evict the least recently used entries """
+
+        # Access the cache
+        cache = self.cache
+
+        # Store a plain copy of the solution
+        cache.store[key] = {k: float(v) for k,v in opt.__dict__.items()}
+        cache.store.move_to_end(key)
+
+        # Evict the oldest entries
+        while len(cache.store) > self.par.cache_size:
+            cache.store.popitem(last=False)
+
+    def clear_cache(self):
+        """ Empty the solution cache and reset the counters """
+
+        self.cache = SimpleNamespace(store=OrderedDict(),hits=0,misses=0)
+
+    def save_cache(self,filename):
+        """ Save the cached solutions to disk """
+
+        with open(filename,'wb') as f:
+            pickle.dump(dict(self.cache.store),f)
+
+    def load_cache(self,filename):
+        """ Load cached solutions from disk (entries already in memory are kept) """
+
+        with open(filename,'rb') as f:
+            store = pickle.load(f)
+
+        # Put loaded entries before the current ones, so the current ones are evicted last
+        store.update(self.cache.store)
+        self.cache.store = OrderedDict(store)
+
+        # Respect the cache size
+        while len(self.cache.store) > self.par.cache_size:
+            self.cache.store.popitem(last=False)
+
+    @instrument.traced
+    def calc_utility(self,LM,HM,LF,HF,wF=None):
+        """ calculate utility (wF defaults to par.wF, arrays broadcast) """
 
         # Access class's parameter and solution objects
         par = self.par
         sol = self.sol
 
+        # Use the parameter's female wage unless a (vector of) wage(s) is given
+        if wF is None:
+            wF = par.wF
+
         # Set consumption of market goods
-        C = par.wM*LM + par.wF*LF
+        C = par.wM*LM + wF*LF
 
         # Set household production
         if par.sigma == 0:
-            H = min(HM,HF)
+            H = np.minimum(HM,HF)
         elif par.sigma == 1:
             H = HM**(1-par.alpha)*HF**par.alpha
         else:
@@ -77,13 +227,177 @@ class HouseholdSpecializationModelClass:
         
         return utility - disutility
 
-    def solve_discrete(self,do_print=False):
+    @instrument.traced
+    def calc_utility_grad(self,LM,HM,LF,HF,wF=None):
+        """ calculate gradient of utility w.r.t. (LM,HM,LF,HF), stacked on the last axis """
+
+        # Access class's parameter object
+        par = self.par
+
+        # Use the parameter's female wage unless a (vector of) wage(s) is given
+        if wF is None:
+            wF = par.wF
+
+        # Set consumption of market goods
+        C = par.wM*LM + wF*LF
+
+        # Floor home production hours so the derivatives stay finite at the zero bound (one-sided values there)
+        HM_ = np.fmax(HM,1e-8)
+        HF_ = np.fmax(HF,1e-8)
+
+        # Set household production and its derivatives w.r.t. HM and HF (Leontief splits ties equally)
+        if par.sigma == 0:
+            H = np.minimum(HM,HF)
+            dH_dHM = np.where(HM < HF,1.0,np.where(HM == HF,0.5,0.0))
+            dH_dHF = 1.0-dH_dHM
+        elif par.sigma == 1:
+            H = HM_**(1-par.alpha)*HF_**par.alpha
+            dH_dHM = (1-par.alpha)*H/HM_
+            dH_dHF = par.alpha*H/HF_
+        else:
+            p = (par.sigma-1)/par.sigma
+            H = ((1-par.alpha)*HM_**p+par.alpha*HF_**p)**(1/p)
+            dH_dHM = (1-par.alpha)*HM_**(p-1)*H**(1-p)
+            dH_dHF = par.alpha*HF_**(p-1)*H**(1-p)
+
+        # Set derivatives of consumption utility w.r.t. C and H (zero where Q is floored)
+        Q = C**par.omega*H**(1-par.omega)
+        I = Q > 1e-8
+        dU_dC = np.where(I,par.omega*Q**(1-par.rho)/C,0.0)
+        dU_dH = np.where(I,(1-par.omega)*Q**(1-par.rho)/H,0.0)
+
+        # Set derivatives of disutility of work
+        TM = LM+par.kappa*HM
+        TF = LF+HF
+        dD_dTM = par.nu*TM**(1/par.epsilon)
+        dD_dTF = par.nu*TF**(1/par.epsilon)
+
+        # Combine by the chain rule
+        dLM = dU_dC*par.wM - dD_dTM
+        dHM = dU_dH*dH_dHM - par.kappa*dD_dTM
+        dLF = dU_dC*wF - dD_dTF
+        dHF = dU_dH*dH_dHF - dD_dTF
+
+        return np.stack(np.broadcast_arrays(dLM,dHM,dLF,dHF),axis=-1)
+
+    def time_constraints(self):
+        """ Time constraints for M and F with their constant Jacobians """
+
+        # Create constraints for M and F
+        constraint_M = ({'type': 'ineq', 'fun': lambda x: 24 - x[0] - x[1], 'jac': lambda x: np.array([-1.0, -1.0, 0.0, 0.0])})
+        constraint_F = ({'type': 'ineq', 'fun': lambda x: 24 - x[2] - x[3], 'jac': lambda x: np.array([0.0, 0.0, -1.0, -1.0])})
+
+        return (constraint_M, constraint_F)
+
+    def feasible_pairs(self):
+        """ Enumerate feasible (L,H) choices on the discrete grid """
+
+        # Access class's parameter object
+        par = self.par
+
+        # Set the number of grid steps in 24 hours
+        n = int(round(24/par.discrete_step))
+
+        # Create all index pairs and keep those where L+H <= 24 (using integer indices avoids rounding issues)
+        i,j = np.meshgrid(np.arange(n+1),np.arange(n+1),indexing='ij')
+        I = (i+j <= n)
+
+        # Return the feasible hours
+        x = np.linspace(0,24,n+1)
+        return x[i[I]], x[j[I]]
+
+    @instrument.traced
+    def solve_discrete(self,do_print=False,full_grid=False):
         """ Solve model discretely """
         
         # Access class's parameter and solution objects
         par = self.par
         sol = self.sol
 
+        # Use the original full grid if requested
+        if full_grid:
+            return self.solve_discrete_full_grid(do_print=do_print)
+
+        # Return cached solution if the problem has been solved before
+        key = self.cache_key('solve_discrete')
+        opt = self.cache_get(key)
+
+        if opt is None:
+            opt = self.solve_discrete_grid()
+            self.cache_put(key,opt)
+
+        # Print the solutions
+        if do_print:
+            for k,v in opt.__dict__.items():
+                print(f'{k} = {v:6.4f}')
+        
+        # Return optimal values
+        return opt 
+
+    def solve_discrete_grid(self):
+        """ Solve model discretely on the feasible grid in chunks """
+
+        # Access class's parameter object
+        par = self.par
+
+        opt = SimpleNamespace()
+
+        # Enumerate only the feasible choices for each member
+        LM,HM = self.feasible_pairs()
+        LF,HF = LM,HM
+
+        # Set the number of male and female choices evaluated in each chunk (at most discrete_chunk utilities)
+        cols = min(LF.size,max(1,par.discrete_chunk))
+        rows = max(1,par.discrete_chunk//cols)
+
+        # Initialize the running maximum
+        u_max = -np.inf
+        j_M = j_F = 0
+
+        # Evaluate utility chunk by chunk and keep track of the maximizing argument
+        for start in range(0,LM.size,rows):
+            stop = min(start+rows,LM.size)
+
+            # Keep the running maximum over the female chunks for each male choice in the chunk
+            u_row = np.full(stop-start,-np.inf)
+            j_row = np.zeros(stop-start,dtype=int)
+
+            for first in range(0,LF.size,cols):
+
+                # Calculate the utility for the chunk of male choices against the chunk of female choices
+                with np.errstate(divide='ignore',invalid='ignore'):
+                    u = self.calc_utility(LM[start:stop,None],HM[start:stop,None],LF[None,first:first+cols],HF[None,first:first+cols])
+
+                # Update the running maximum of each male choice if the chunk is better
+                j = np.argmax(u,axis=1)
+                u_j = u[np.arange(stop-start),j]
+                I = u_j > u_row
+                u_row[I] = u_j[I]
+                j_row[I] = first+j[I]
+
+            # Find the maximizing male choice in the chunk
+            i = np.argmax(u_row)
+
+            # Update the running maximum if the chunk is better
+            if u_row[i] > u_max:
+                u_max = u_row[i]
+                j_M, j_F = start+i, j_row[i]
+
+        # Save the values which maximizes utility
+        opt.LM = LM[j_M]
+        opt.HM = HM[j_M]
+        opt.LF = LF[j_F]
+        opt.HF = HF[j_F]
+
+        return opt
+
+    def solve_discrete_full_grid(self,do_print=False):
+        """ Solve model discretely on the full (unconstrained) grid """
+        
+        # Access class's parameter and solution objects
+        par = self.par
+        sol = self.sol
+
         opt = SimpleNamespace()
         
         # Set the possible choices in half hours
@@ -120,23 +434,49 @@ class HouseholdSpecializationModelClass:
         # Return optimal values
         return opt 
     
+    @instrument.traced
     def solve(self,do_print=False):
         """ Solve model continously """
 
         # Access class's parameter and solution objects
         par = self.par
         sol = self.sol 
+
+        # Return cached solution if the problem has been solved before
+        key = self.cache_key('solve')
+        opt = self.cache_get(key)
+
+        if opt is None:
+            opt, res = self.solve_continuous()
+
+            # Only cache converged solutions and warn about the others
+            if res.success:
+                self.cache_put(key,opt)
+            else:
+                warnings.warn(f'solve did not converge at {dict(zip(CACHE_FIELDS,key[1:]))}: {res.message}',RuntimeWarning)
+
+        # Print the solutions
+        if do_print:
+            for k,v in opt.__dict__.items():
+                print(f'{k} = {v:6.4f}')
+        
+        return opt
+
+    @instrument.traced
+    def solve_continuous(self):
+        """ Solve model continously with SLSQP (no caching), returns the optimum and the SciPy result """
+
         opt = SimpleNamespace()
 
-        # Set the objective function
+        # Set the objective function and its analytic gradient
         def objective(x):
             return -self.calc_utility(x[0],x[1],x[2],x[3])
+
+        def jac(x):
+            return -self.calc_utility_grad(x[0],x[1],x[2],x[3])
         
         # Create constraints for M and F
-        constraint_M = ({'type': 'ineq', 'fun': lambda x: 24 - x[0] - x[1]})
-        constraint_F = ({'type': 'ineq', 'fun': lambda x: 24 - x[2] - x[3]})
-
-        constraints = (constraint_M, constraint_F)
+        constraints = self.time_constraints()
 
         # Set bounds
         bounds = ((0,24),(0,24),(0,24),(0,24))
@@ -145,8 +485,12 @@ class HouseholdSpecializationModelClass:
         initial_guess = [12, 12, 12, 12]
 
         # Find the solutions using solver optimize minimize 
-        sol = optimize.minimize(fun = objective, x0 = initial_guess, method = 'SLSQP', bounds=bounds,
-                                 constraints=constraints, tol = 1e-10)
+        with np.errstate(divide='ignore',invalid='ignore'):
+            sol = optimize.minimize(fun = objective, x0 = initial_guess, jac = jac, method = 'SLSQP', bounds=bounds,
+                                    constraints=constraints, tol = 1e-10)
+
+        # Record the solver status
+        _record_status('solve_continuous',sol)
 
         # Save the values which maximizes utility
         opt.LM = sol.x[0]
@@ -154,15 +498,11 @@ class HouseholdSpecializationModelClass:
         opt.LF = sol.x[2]
         opt.HF = sol.x[3]
 
-        # Print the solutions
-        if do_print:
-            for k,v in opt.__dict__.items():
-                print(f'{k} = {v:6.4f}')
-        
-        return opt
+        return opt, sol
     
+    @instrument.traced
     def solve_wF_vec(self,discrete=False):
-        """ Solve model for female wage vector """
+        """ Solve model for female wage vector (one cached solve per wage, see solve_wF_batch for a warm-started sweep) """
 
         # Access class's parameter and solution objects
         par = self.par
@@ -183,6 +523,82 @@ class HouseholdSpecializationModelClass:
             sol.LF_vec[i] = opt.LF
             sol.HF_vec[i] = opt.HF
 
+    @instrument.traced
+    def solve_wF_sweep(self,wF_vec,initial_guess=None):
+        """ Solve model continously for a sorted wage vector, warm starting from the previous wage """
+
+        # Access class's parameter object
+        par = self.par
+
+        # Set constraints, bounds and the first initial guess as in solve
+        constraints = self.time_constraints()
+        bounds = ((0,24),(0,24),(0,24),(0,24))
+        x0 = np.array([12, 12, 12, 12] if initial_guess is None else initial_guess,dtype=float)
+
+        # Create array to store the solutions
+        X = np.empty((len(wF_vec),4))
+
+        for i, wF in enumerate(wF_vec):
+
+            # Set the objective function and its analytic gradient
+            objective = lambda x: -self.calc_utility(x[0],x[1],x[2],x[3],wF=wF)
+            jac = lambda x: -self.calc_utility_grad(x[0],x[1],x[2],x[3],wF=wF)
+
+            # Solve with a warm start from the neighbouring wage's optimum
+            with np.errstate(divide='ignore',invalid='ignore'):
+                res = optimize.minimize(fun = objective, x0 = x0, jac = jac, method = 'SLSQP', bounds=bounds,
+                                        constraints=constraints, tol = 1e-10)
+
+                # Solve again as the original solve (initial guess of 12 hours, finite differences) if the warm start failed
+                if not res.success:
+                    cold = optimize.minimize(fun = objective, x0 = [12, 12, 12, 12], method = 'SLSQP', bounds=bounds,
+                                             constraints=constraints, tol = 1e-10)
+                    if cold.success or cold.fun < res.fun:
+                        res = cold
+
+            # Record the solver status
+            _record_status('solve_wF_sweep',res)
+
+            # Store the solution and use it as the next initial guess
+            X[i] = x0 = res.x
+
+        return X
+
+    @instrument.traced
+    def solve_wF_batch(self,wF_vec=None,workers=None):
+        """ Solve model continously for a whole female wage vector at once (the solutions are only stored in sol for par.wF_vec) """
+
+        # Access class's parameter and solution objects
+        par = self.par
+        sol = self.sol
+
+        # Use the parameter's wage vector unless another one is given
+        store = wF_vec is None
+        wF_vec = par.wF_vec if store else np.asarray(wF_vec,dtype=float)
+
+        # Sort the wages so neighbouring problems are close and warm starts pay off
+        order = np.argsort(wF_vec)
+
+        # Solve the sweep serially or split into contiguous blocks solved in a process pool
+        if workers is None or workers <= 1:
+            X_sorted = self.solve_wF_sweep(wF_vec[order])
+        else:
+            blocks = [block for block in np.array_split(wF_vec[order],workers) if block.size > 0]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                X_sorted = np.vstack(list(pool.map(_solve_wF_sweep_block,[par]*len(blocks),blocks)))
+
+        # Undo the sorting
+        X = np.empty_like(X_sorted)
+        X[order] = X_sorted
+
+        # Store the solutions for par.wF_vec and the implied utilities, evaluated in one vectorized pass
+        if store:
+            sol.LM_vec, sol.HM_vec, sol.LF_vec, sol.HF_vec = X.T.copy()
+            sol.u_vec = self.calc_utility(X[:,0],X[:,1],X[:,2],X[:,3],wF=wF_vec)
+
+        return X
+
+    @instrument.traced
     def run_regression(self):
         """ Run regression """
 
@@ -200,8 +616,113 @@ class HouseholdSpecializationModelClass:
         # Perform regression and save coefficients
         sol.beta0, sol.beta1 = np.linalg.lstsq(A,y,rcond=None)[0]
 
-    def estimate(self):
-        """ estimate alpha and sigma """
+    @instrument.traced
+    def calc_sensitivity(self,names=('alpha','sigma','kappa'),x=None,step=1e-6,tol=1e-6):
+        """ Derivatives of the continuous optimum (LM,HM,LF,HF) w.r.t. the parameters in names by the implicit function theorem
+
+        Args:
+            names (tuple): Parameters to differentiate with respect to, default = ('alpha','sigma','kappa')
+            x     (array): Optimum (LM,HM,LF,HF) at the current parameters, default = None (solved with solve)
+            step  (float): Relative step for differencing the analytic gradient, default = 1e-6
+            tol   (float): Slack below which a time constraint or bound counts as active, default = 1e-6
+
+        Returns:
+            (4, len(names)) array of derivatives
+        """
+        # Access class's parameter object
+        par = self.par
+
+        # Solve unless the optimum is given
+        if x is None:
+            opt = self.solve()
+            x = np.array([opt.LM,opt.HM,opt.LF,opt.HF])
+        x = np.asarray(x,dtype=float)
+
+        # Choices at their bounds stay there for small parameter changes, only the free choices are differentiated
+        free = np.flatnonzero((x >= tol) & (x <= 24-tol))
+        k = free.size
+
+        # Hessian of utility w.r.t. the free choices by differences of the analytic gradient (all points in one call),
+        # central in the interior and one-sided within a step of the bounds so the gradient is never evaluated outside them
+        h = step*np.fmax(x,1.0)
+        x_up = np.fmin(x+h,24)
+        x_down = np.fmax(x-h,0)
+        X = np.vstack([x+np.diag(x_up-x)[free],x-np.diag(x-x_down)[free]])
+        with np.errstate(divide='ignore',invalid='ignore'):
+            G = self.calc_utility_grad(X[:,0],X[:,1],X[:,2],X[:,3])[:,free]
+        hess = (G[:k]-G[k:]).T/(x_up-x_down)[free]
+        hess = (hess+hess.T)/2
+
+        # Cross derivatives of the gradient w.r.t. the parameters
+        cross = np.empty((k,len(names)))
+        for j, name in enumerate(names):
+            value = getattr(par,name)
+            h_par = step*max(abs(value),1.0)
+            grads = []
+            try:
+                for sign in (1,-1):
+                    setattr(par,name,value+sign*h_par)
+                    grads.append(self.calc_utility_grad(*x)[free])
+            finally:
+                setattr(par,name,value)
+            cross[:,j] = (grads[0]-grads[1])/(2*h_par)
+
+        # Active time constraints in the free choices, which stay active for small parameter changes
+        active = []
+        if 24-x[0]-x[1] < tol:
+            active.append([1.0,1.0,0.0,0.0])
+        if 24-x[2]-x[3] < tol:
+            active.append([0.0,0.0,1.0,1.0])
+        A = np.array(active).reshape(-1,4)[:,free]
+        A = A[A.any(axis=1)]
+
+        # Differentiate the first order conditions: hess dx + A' dlambda = -cross, A dx = 0
+        n = A.shape[0]
+        K = np.block([[hess,A.T],[A,np.zeros((n,n))]])
+        rhs = np.vstack([-cross,np.zeros((n,len(names)))])
+        dx = np.zeros((4,len(names)))
+        dx[free] = np.linalg.lstsq(K,rhs,rcond=None)[0][:k]
+
+        return dx
+
+    @instrument.traced
+    def calc_moment_jacobian(self,names=('alpha','sigma')):
+        """ Solve for the female wage vector, run the regression and differentiate (beta0,beta1) w.r.t. the parameters in names
+
+        Args:
+            names (tuple): Parameters to differentiate with respect to, default = ('alpha','sigma')
+
+        Returns:
+            (2, len(names)) Jacobian of (beta0,beta1)
+        """
+        # Access class's parameter and solution objects
+        par = self.par
+        sol = self.sol
+
+        # Solve and run the regression
+        self.solve_wF_vec()
+        self.run_regression()
+
+        # Differentiate the log ratio log(HF/HM) at each wage
+        wF = par.wF
+        dy = np.empty((par.wF_vec.size,len(names)))
+        try:
+            for i, wF_i in enumerate(par.wF_vec):
+                par.wF = wF_i
+                x = np.array([sol.LM_vec[i],sol.HM_vec[i],sol.LF_vec[i],sol.HF_vec[i]])
+                dx = self.calc_sensitivity(names,x=x)
+                dy[i] = dx[3]/x[3]-dx[1]/x[1]
+        finally:
+            par.wF = wF
+
+        # The regression coefficients are linear in y
+        A = np.vstack([np.ones(par.wF_vec.size),np.log(par.wF_vec)]).T
+
+        return np.linalg.pinv(A) @ dy
+
+    @instrument.traced
+    def estimate(self,method='Nelder-Mead'):
+        """ estimate alpha and sigma (method 'gauss-newton' or 'L-BFGS-B' uses estimate_gradient) """
 
         # Access class's parameter and solution objects
         par = self.par
@@ -215,7 +736,12 @@ class HouseholdSpecializationModelClass:
             self.solve_wF_vec()
             
             self.run_regression()
-            return (par.beta0_target - sol.beta0)**2 + (par.beta1_target - sol.beta1)**2
+            loss = (par.beta0_target - sol.beta0)**2 + (par.beta1_target - sol.beta1)**2
+
+            # Record the convergence trace
+            instrument.record('trace','estimate',x=x.copy(),loss=loss,beta0=sol.beta0,beta1=sol.beta1)
+
+            return loss
         
         # Set bounds
         bounds = ((0.5, 0.99), (0.01, 0.33))
@@ -223,6 +749,11 @@ class HouseholdSpecializationModelClass:
         # Create an initial guess
         initial_guess = [0.8, 0.1] 
 
+        # Use the derivatives of the moments unless Nelder-Mead is requested
+        if method != 'Nelder-Mead':
+            self.estimate_gradient(('alpha','sigma'),bounds,initial_guess,method=method)
+            return sol
+
         # Find the solutions using solver optimize minimize 
         solution = optimize.minimize(fun = objective, x0 = initial_guess, method = 'Nelder-Mead', bounds = bounds)
 
@@ -232,8 +763,9 @@ class HouseholdSpecializationModelClass:
 
         return sol
     
-    def estimate_sigma_kappa(self, alpha=0.5):
-        """ estimate sigma and kappa with fixed alpha """
+    @instrument.traced
+    def estimate_sigma_kappa(self, alpha=0.5, method='Nelder-Mead'):
+        """ estimate sigma and kappa with fixed alpha (method 'gauss-newton' or 'L-BFGS-B' uses estimate_gradient) """
 
         # Access class's parameter and solution objects
         par = self.par
@@ -248,7 +780,12 @@ class HouseholdSpecializationModelClass:
             self.solve_wF_vec()
 
             self.run_regression()
-            return (par.beta0_target - sol.beta0)**2 + (par.beta1_target - sol.beta1)**2
+            loss = (par.beta0_target - sol.beta0)**2 + (par.beta1_target - sol.beta1)**2
+
+            # Record the convergence trace
+            instrument.record('trace','estimate_sigma_kappa',x=x.copy(),loss=loss,beta0=sol.beta0,beta1=sol.beta1)
+
+            return loss
         
         # Set bounds
         bounds = [(0.01, 0.33), (1, 40)] # bounds for sigma and kappa
@@ -256,6 +793,11 @@ class HouseholdSpecializationModelClass:
         # Create an initial guess
         initial_guess = [0.1, 10.0] # initial guess for sigma and kappa
 
+        # Use the derivatives of the moments unless Nelder-Mead is requested
+        if method != 'Nelder-Mead':
+            self.estimate_gradient(('sigma','kappa'),bounds,initial_guess,fixed={'alpha': alpha},method=method)
+            return sol
+
         # Find the solutions using solver optimize minimize 
         solution = optimize.minimize(fun = objective, x0 = initial_guess, method = 'Nelder-Mead', bounds = bounds)
         
@@ -264,4 +806,277 @@ class HouseholdSpecializationModelClass:
         sol.sigma = solution.x[0] # estimated sigma
         sol.kappa = solution.x[1] # estimated kappa
 
-        return sol
\ No newline at end of file
+        return sol
+
+    @instrument.traced
+    def calc_loss(self,x,names):
+        """ Set the parameters in names to x and calculate the squared moment residuals """
+
+        # Access class's parameter and solution objects
+        par = self.par
+        sol = self.sol
+
+        # Set parameters
+        for name, value in zip(names,x):
+            setattr(par,name,value)
+
+        # Solve and run the regression
+        self.solve_wF_vec()
+        self.run_regression()
+        loss = (par.beta0_target - sol.beta0)**2 + (par.beta1_target - sol.beta1)**2
+
+        # Record the convergence trace
+        instrument.record('trace','calc_loss',x=np.array(x,dtype=float),loss=loss,beta0=sol.beta0,beta1=sol.beta1)
+
+        return loss
+
+    @instrument.traced
+    def estimate_gradient(self,names=('alpha','sigma'),bounds=((0.5, 0.99), (0.01, 0.33)),initial_guess=(0.8, 0.1),
+                          fixed=None,method='gauss-newton'):
+        """ estimate the parameters in names with derivatives of the moments from calc_moment_jacobian
+
+        Args:
+            names         (tuple): Parameters to estimate, default = ('alpha','sigma')
+            bounds        (tuple): Bounds for each parameter, default = ((0.5, 0.99), (0.01, 0.33))
+            initial_guess (tuple): Initial guess, default = (0.8, 0.1)
+            fixed          (dict): Parameters fixed during the estimation, default = None
+            method          (str): 'gauss-newton' (least squares on the two moment residuals) or 'L-BFGS-B' (on the loss), default = 'gauss-newton'
+
+        Returns:
+            SciPy result with x, fun (the loss) and nfev
+        """
+        # Access class's parameter and solution objects
+        par = self.par
+        sol = self.sol
+
+        # Set fixed parameters
+        fixed = {} if fixed is None else fixed
+        for name, value in fixed.items():
+            setattr(par,name,value)
+
+        # Calculate the moment residuals and their Jacobian, reusing the last evaluation for the same x
+        last = {}
+        def residuals_and_jacobian(x):
+            if last.get('x') is None or not np.array_equal(last['x'],x):
+                for name, value in zip(names,x):
+                    setattr(par,name,value)
+                J = self.calc_moment_jacobian(names)
+                r = np.array([sol.beta0-par.beta0_target,sol.beta1-par.beta1_target])
+                last.update(x=np.array(x,dtype=float),r=r,J=J)
+
+                # Record the convergence trace
+                instrument.record('trace','estimate_gradient',x=last['x'],loss=r@r,beta0=sol.beta0,beta1=sol.beta1)
+
+            return last['r'], last['J']
+
+        # Find the solution with Gauss-Newton (trust region) or L-BFGS-B
+        if method == 'gauss-newton':
+            bounds_ls = (np.array(bounds)[:,0],np.array(bounds)[:,1])
+            res = optimize.least_squares(fun = lambda x: residuals_and_jacobian(x)[0], x0 = initial_guess,
+                                         jac = lambda x: residuals_and_jacobian(x)[1], bounds = bounds_ls, method = 'trf',
+                                         xtol = 1e-10, ftol = 1e-12, gtol = 1e-12)
+
+            # Report the loss as fun like the other estimators (the residuals are kept)
+            res.residuals = res.fun
+            res.fun = 2*res.cost
+        elif method == 'L-BFGS-B':
+            def objective(x):
+                r, J = residuals_and_jacobian(x)
+                return r@r, 2*J.T@r
+            res = optimize.minimize(fun = objective, x0 = initial_guess, jac = True, method = 'L-BFGS-B', bounds = bounds)
+        else:
+            raise ValueError(f'unknown method {method}, use gauss-newton or L-BFGS-B')
+
+        # Re-solve at the estimate so par and sol are consistent
+        self.calc_loss(res.x,names)
+
+        # Save the estimates
+        for name, value in {**fixed,**dict(zip(names,res.x))}.items():
+            setattr(sol,name,value)
+
+        return res
+
+    @instrument.traced
+    def estimate_multi_start(self,names=('alpha','sigma'),bounds=((0.5, 0.99), (0.01, 0.33)),fixed=None,
+                             n_starts=16,sampler='sobol',seed=0,workers=None,do_print=False):
+        """ estimate the parameters in names with Nelder-Mead from many starting points in parallel """
+
+        # Access class's parameter and solution objects
+        par = self.par
+        sol = self.sol
+
+        # Set fixed parameters (e.g. alpha when estimating sigma and kappa)
+        fixed = {} if fixed is None else fixed
+        for name, value in fixed.items():
+            setattr(par,name,value)
+
+        # Draw starting points inside the bounds (scipy.stats is imported here as it is slow to import)
+        from scipy.stats import qmc
+        bounds = np.array(bounds,dtype=float)
+        if sampler == 'sobol':
+            unit = qmc.Sobol(d=len(names),seed=seed).random(n_starts)
+        elif sampler == 'lhs':
+            unit = qmc.LatinHypercube(d=len(names),seed=seed).random(n_starts)
+        else:
+            raise ValueError(f'unknown sampler {sampler}, use sobol or lhs')
+        starts = qmc.scale(unit,bounds[:,0],bounds[:,1])
+
+        # Run Nelder-Mead from each start, serially or in a process pool with independent model copies
+        t0 = time.perf_counter()
+        args = ([par]*n_starts,[tuple(names)]*n_starts,[tuple(map(tuple,bounds))]*n_starts,list(starts))
+        if workers is None or workers <= 1:
+            runs = list(map(_estimate_from_start,*args))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                runs = list(pool.map(_estimate_from_start,*args))
+        wall_time = time.perf_counter()-t0
+
+        # Find the best fit
+        best = min(runs,key=lambda run: run.fun)
+
+        # Re-solve at the best fit so par and sol are consistent
+        self.calc_loss(best.x,names)
+
+        # Save the estimates
+        for name, value in {**fixed,**dict(zip(names,best.x))}.items():
+            setattr(sol,name,value)
+
+        # Collect diagnostics
+        res = SimpleNamespace()
+        res.x = best.x
+        res.fun = best.fun
+        res.runs = runs
+        res.wall_time = wall_time
+        res.nfev = sum(run.nfev for run in runs)
+
+        # Print the diagnostics
+        if do_print:
+            for i, run in enumerate(runs):
+                print(f'start {i:3d}: x0 = {np.round(run.x0,3)}, x = {np.round(run.x,4)}, loss = {run.fun:.3e}, nfev = {run.nfev}, time = {run.time:.2f}s')
+            print(f'best loss = {res.fun:.3e} at x = {np.round(res.x,4)}, total nfev = {res.nfev}, wall time = {wall_time:.2f}s')
+
+        return res
+
+
+def copy_model(par):
+    """ Create an independent model with a copy of the parameters """
+
+    # Create model and copy parameters
+    model = HouseholdSpecializationModelClass()
+    model.par = SimpleNamespace(**vars(par))
+
+    # Size solution vectors to the wage vector
+    for name in ('LM_vec','HM_vec','LF_vec','HF_vec'):
+        setattr(model.sol,name,np.zeros(model.par.wF_vec.size))
+
+    return model
+
+def _make_record(values):
+    """ Create a ParRecord from a tuple of the fields in CACHE_FIELDS (used when unpickling) """
+
+    return ParRecord(**dict(zip(CACHE_FIELDS,values)))
+
+def par_records(par=None,**values):
+    """ Create a PAR_DTYPE array with one row per scenario
+
+    Args:
+        par (SimpleNamespace): Parameters used for fields not given in values, default = model defaults
+        **values              : Arrays (or scalars) of parameter values, broadcast to a common shape
+
+    Returns:
+        Structured array of parameter records
+    """
+    # Use the model's default parameters unless given
+    par = HouseholdSpecializationModelClass().par if par is None else par
+
+    # Broadcast the given values to a common shape
+    for name in values:
+        if name not in CACHE_FIELDS:
+            raise ValueError(f'{name} is not a parameter record field, use one of {CACHE_FIELDS}')
+    arrays = np.broadcast_arrays(*[np.asarray(values.get(name,getattr(par,name)),dtype=float) for name in CACHE_FIELDS])
+
+    # Fill the structured array
+    records = np.empty(arrays[0].shape,dtype=PAR_DTYPE)
+    for name, array in zip(CACHE_FIELDS,arrays):
+        records[name] = array
+
+    return records
+
+def solve_records(records,workers=None):
+    """ Solve the model continously for each row of a PAR_DTYPE array
+
+    Args:
+        records (np.ndarray): Structured array of parameter records
+        workers        (int): Number of processes, default = None (serial)
+
+    Returns:
+        Structured SOL_DTYPE array with the same shape as records
+    """
+    # Flatten the records
+    flat = np.ascontiguousarray(records,dtype=PAR_DTYPE).ravel()
+
+    # Solve serially or in contiguous blocks in a process pool
+    if workers is None or workers <= 1:
+        result = _solve_records_block(flat)
+    else:
+        blocks = [block for block in np.array_split(flat,workers) if block.size > 0]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            result = np.concatenate(list(pool.map(_solve_records_block,blocks)))
+
+    return result.reshape(np.shape(records))
+
+def _record_status(name,res):
+    """ Count failed solves and record the status of a SciPy result when instrumentation is enabled """
+
+    # Skip building the event when disabled
+    tracer = instrument.active()
+    if tracer is None:
+        return
+
+    if not res.success:
+        tracer.count(name+'_failed')
+    tracer.record('status',name,success=bool(res.success),status=int(res.status),message=res.message,
+                  nit=res.nit,nfev=res.nfev,njev=res.njev,fun=float(res.fun))
+
+def _solve_records_block(records):
+    """ Solve a block of parameter records, each with its own immutable parameters """
+
+    # Create a private model, its parameters are replaced by each record
+    model = HouseholdSpecializationModelClass()
+
+    # Create array to store the solutions
+    result = np.empty(records.shape,dtype=SOL_DTYPE)
+
+    for i, record in enumerate(records):
+        model.par = ParRecord.from_par(record)
+        opt, res = model.solve_continuous()
+        result[i] = (opt.LM,opt.HM,opt.LF,opt.HF,-res.fun,res.success)
+
+    return result
+
+def _solve_wF_sweep_block(par,wF_vec):
+    """ Solve a block of wages in a worker process with its own model copy """
+
+    return copy_model(par).solve_wF_sweep(wF_vec)
+
+def _estimate_from_start(par,names,bounds,x0):
+    """ Run one Nelder-Mead estimation from x0 on an independent model copy """
+
+    # Create an independent model
+    model = copy_model(par)
+
+    # Find the solution and time it
+    t0 = time.perf_counter()
+    solution = optimize.minimize(fun = model.calc_loss, x0 = x0, args = (names,), method = 'Nelder-Mead', bounds = bounds)
+
+    # Collect per-start diagnostics
+    run = SimpleNamespace()
+    run.x0 = np.asarray(x0)
+    run.x = solution.x
+    run.fun = solution.fun
+    run.nfev = solution.nfev
+    run.nit = solution.nit
+    run.success = solution.success
+    run.time = time.perf_counter()-t0
+
+    return run
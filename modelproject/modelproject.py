@@ -1,6 +1,16 @@
 import numpy as np
 from scipy import optimize
 import random
+import math
+import os
+import sys
+
+# Make the instrumentation module shared by the projects importable
+SHARED_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shared')
+if SHARED_DIR not in sys.path:
+    sys.path.append(SHARED_DIR)
+
+import jts_instrument as instrument
 
 def solow_equations(variables, s_K, s_H, n, g, delta, alpha, varphi):
     """
@@ -33,6 +43,7 @@ def solow_equations(variables, s_K, s_H, n, g, delta, alpha, varphi):
     return solow_k, solow_h
 
 
+@instrument.traced
 def multi_start(num_guesses=100, bounds=[1e-5, 50], fun=solow_equations, args= None, method='hybr'):
     """
     Performs multi-start optimization to find the steady state solutions for k and h.
@@ -64,6 +75,15 @@ def multi_start(num_guesses=100, bounds=[1e-5, 50], fun=solow_equations, args= N
         # Calculate the residual norm (Euclidean norm) of the current solution
         residual_norm = np.linalg.norm(sol.fun)
 
+        # Record the solver status and the residual (only when instrumentation is enabled)
+        tracer = instrument.active()
+        if tracer is not None:
+            if not sol.success:
+                tracer.count('multi_start_failed')
+            tracer.count('solow_equations', sol.nfev)
+            tracer.record('status', 'multi_start', success=bool(sol.success), status=int(sol.status), message=sol.message,
+                          nfev=sol.nfev, x0=np.array(initial_guess), x=sol.x, residual=residual_norm)
+
         # If the residual norm is smaller than the current smallest residual, update the steady state of k and h and the smallest residual
         if residual_norm < smallest_residual:
             smallest_residual = residual_norm
@@ -73,6 +93,103 @@ def multi_start(num_guesses=100, bounds=[1e-5, 50], fun=solow_equations, args= N
     return steady_state_k, steady_state_h, smallest_residual
 
 
+def steady_state(s_K, s_H, n, g, delta, alpha, varphi, tol=1e-12, max_iter=100):
+    """
+    Computes the steady state for arrays of parameters in one vectorized pass.
+    Uses the closed form and falls back to Newton's method (in logs) with an analytic Jacobian for any case it cannot handle.
+
+    Args:
+        s_K        (float or array): Savings rate in physical capital
+        s_H        (float or array): Savings rate in human capital
+        n          (float or array): Population growth rate
+        g          (float or array): TFP growth rate
+        delta      (float or array): Depreciation rate
+        alpha      (float or array): Output elasticity of physical capital
+        varphi     (float or array): Output elasticity of human capital
+        tol                 (float): Tolerance for Newton's method, default = 1e-12
+        max_iter              (int): Maximum number of Newton iterations, default = 100
+
+    Returns:
+        Arrays of steady state values for k, h and y (NaN where no positive steady state is found)
+    """
+    # Broadcast the parameters to a common shape
+    s_K, s_H, n, g, delta, alpha, varphi = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (s_K, s_H, n, g, delta, alpha, varphi)])
+
+    # Set the effective depreciation rate
+    m = n + g + delta + n * g
+
+    # Closed form steady state
+    with np.errstate(all='ignore'):
+        power = 1 / (1 - alpha - varphi)
+        k = np.array(s_K**(1 - varphi) * s_H**varphi / m, ndmin=1)**power
+        h = np.array(s_K**alpha * s_H**(1 - alpha) / m, ndmin=1)**power
+
+    # Cases the closed form cannot handle
+    I = ~(np.isfinite(k) & np.isfinite(h) & (k > 0) & (h > 0))
+
+    # Solve those cases with vectorized Newton iterations
+    if I.any():
+        k[I], h[I] = newton_steady_state(*[np.array(x, ndmin=1)[I] for x in (s_K, s_H, m, alpha, varphi)], tol=tol, max_iter=max_iter)
+
+    # Restore the shape of the parameters (scalars for scalar parameters)
+    k, h = k.reshape(s_K.shape)[()], h.reshape(s_K.shape)[()]
+
+    # Calculate steady state of production
+    y = k**alpha * h**varphi
+
+    # Return steady states
+    return k, h, y
+
+
+def newton_steady_state(s_K, s_H, m, alpha, varphi, tol=1e-12, max_iter=100):
+    """
+    Solves s_K k^(alpha-1) h^varphi = m and s_H k^alpha h^(varphi-1) = m for arrays of parameters by Newton's method in (log k, log h)
+
+    Args:
+        s_K        (array): Savings rate in physical capital
+        s_H        (array): Savings rate in human capital
+        m          (array): Effective depreciation rate n + g + delta + n*g
+        alpha      (array): Output elasticity of physical capital
+        varphi     (array): Output elasticity of human capital
+        tol        (float): Tolerance on the residuals, default = 1e-12
+        max_iter     (int): Maximum number of iterations, default = 100
+
+    Returns:
+        Arrays of k and h (NaN where the iteration did not converge)
+    """
+    # Start from k = h = 1
+    a = np.zeros(s_K.shape)
+    b = np.zeros(s_K.shape)
+    converged = np.zeros(s_K.shape, dtype=bool)
+
+    with np.errstate(all='ignore'):
+        for _ in range(max_iter):
+            # Residuals of the steady state conditions
+            A = s_K * np.exp((alpha - 1) * a + varphi * b)
+            B = s_H * np.exp(alpha * a + (varphi - 1) * b)
+            F1 = A - m
+            F2 = B - m
+
+            # Stop when all residuals are small
+            converged = (np.abs(F1) < tol) & (np.abs(F2) < tol)
+            if converged.all():
+                break
+
+            # Analytic Jacobian and Newton step by Cramer's rule
+            J11, J12 = (alpha - 1) * A, varphi * A
+            J21, J22 = alpha * B, (varphi - 1) * B
+            det = J11 * J22 - J12 * J21
+            a = a - (J22 * F1 - J12 * F2) / det
+            b = b - (J11 * F2 - J21 * F1) / det
+
+    # Set non-converged cases to NaN
+    k = np.where(converged, np.exp(a), np.nan)
+    h = np.where(converged, np.exp(b), np.nan)
+
+    return k, h
+
+
+@instrument.traced
 def null_clines(s_K, s_H, g, n, alpha, varphi, delta, Max = 50, N = 500):
     """
     Args:
@@ -111,10 +228,15 @@ def null_clines(s_K, s_H, g, n, alpha, varphi, delta, Max = 50, N = 500):
             sol_k = optimize.root_scalar(f = null_k, method = 'brentq', bracket = [1e-20, 50])
             sol_h = optimize.root_scalar(f = null_h, method = 'brentq', bracket = [1e-20, 50])
 
+            # Count the root finder's iterations and function calls
+            instrument.count('brentq_iterations', sol_k.iterations + sol_h.iterations)
+            instrument.count('solow_equations', sol_k.function_calls + sol_h.function_calls)
+
             # Save the roots
             h_vec_k[i], h_vec_h[i] = sol_k.root, sol_h.root
     
         except ValueError:
+            instrument.count('null_clines_failed')
             if root_error == False:
                 print('Due to f(a)f(b)>0, the method failed to find roots for some or all values of k')
                 root_error = True  # Set the flag to True
@@ -140,6 +262,189 @@ def find_intersection(x, y, z):
     # Return value of x, y and z at index
     return x[idx[0][0]], y[idx[0][0]], z[idx[0][0]]
 
+def null_clines_vec(s_K, s_H, g, n, alpha, varphi, delta, Max = 50, N = 500, h_max = None):
+    """
+    Computes the null-clines explicitly as functions of k in one array operation.
+    Parameters can be arrays, in which case the curves are stacked along the leading axes and k runs along the last axis.
+
+    Args:
+        s_K       (float or array): Savings rate in physical capital
+        s_H       (float or array): Savings rate in human capital
+        g         (float or array): TFP growth rate
+        n         (float or array): Population growth rate
+        alpha     (float or array): Output elasticity of physical capital
+        varphi    (float or array): Output elasticity of human capital
+        delta     (float or array): Depreciation rate
+        Max                (float): Maximum value of k
+        N                    (int): Number of values of k
+        h_max              (float): If given, values of h above h_max are set to NaN (as null_clines does for h > 50), default = None
+
+    Returns:
+        Null-clines for physical capital and human capital (NaN where no positive finite h exists)
+    """
+    # Create a vector for N values of k from 0 to Max 
+    k_vec = np.linspace(1e-5, Max, N)
+
+    # Add a trailing axis to the parameters so they broadcast against k
+    s_K, s_H, g, n, alpha, varphi, delta = [np.asarray(x, dtype=float)[..., None] for x in (s_K, s_H, g, n, alpha, varphi, delta)]
+
+    # Set the effective depreciation rate
+    m = n + g + delta + n * g
+
+    with np.errstate(all='ignore'):
+        # Delta k = 0: s_K k^alpha h^varphi = m k
+        h_vec_k = (m * k_vec**(1 - alpha) / s_K)**(1 / varphi)
+
+        # Delta h = 0: s_H k^alpha h^varphi = m h
+        h_vec_h = (s_H * k_vec**alpha / m)**(1 / (1 - varphi))
+
+    # Set values without a positive finite solution (and above h_max) to NaN
+    for h_vec in (h_vec_k, h_vec_h):
+        invalid = ~np.isfinite(h_vec) | (h_vec <= 0)
+        if h_max is not None:
+            invalid |= h_vec > h_max
+        h_vec[invalid] = np.nan
+
+    # Return array of solutions
+    return k_vec, h_vec_k, h_vec_h
+
+def null_cline_intersection(s_K, s_H, g, n, alpha, varphi, delta):
+    """
+    Computes the exact intersection of the null-clines from null_clines_vec, also for scalar parameters.
+    Without a positive steady state (e.g. alpha + varphi = 1 or a zero savings rate) the intersection is NaN.
+
+    Args:
+        s_K       (float or array): Savings rate in physical capital
+        s_H       (float or array): Savings rate in human capital
+        g         (float or array): TFP growth rate
+        n         (float or array): Population growth rate
+        alpha     (float or array): Output elasticity of physical capital
+        varphi    (float or array): Output elasticity of human capital
+        delta     (float or array): Depreciation rate
+
+    Returns:
+        Exact intersection (k, h) of the null-clines, i.e. the steady state (NaN where there is none)
+    """
+    # The null-clines intersect at the steady state
+    k, h, y = steady_state(s_K, s_H, n, g, delta, alpha, varphi)
+
+    return k, h
+
+def phase_field(s_K, s_H, n, g, delta, alpha, varphi, k_max=50, h_max=50, N=40, M=None):
+    """
+    Computes the transition vector field (k_{t+1}-k_t, h_{t+1}-h_t) of the law of motion in solow_equations on a (k, h) grid in one array pass.
+    Parameters can be arrays, in which case the fields are stacked along the leading axes.
+
+    Args:
+        s_K       (float or array): Savings rate in physical capital
+        s_H       (float or array): Savings rate in human capital
+        n         (float or array): Population growth rate
+        g         (float or array): TFP growth rate
+        delta     (float or array): Depreciation rate
+        alpha     (float or array): Output elasticity of physical capital
+        varphi    (float or array): Output elasticity of human capital
+        k_max              (float): Maximum value of k, default = 50
+        h_max              (float): Maximum value of h, default = 50
+        N                    (int): Number of values of k, default = 40
+        M                    (int): Number of values of h, default = None (same as N)
+
+    Returns:
+        k_vec (N,), h_vec (M,) and the changes dk and dh with shape (..., M, N), ready for plt.quiver(k_vec, h_vec, dk, dh) or plt.streamplot
+    """
+    M = N if M is None else M
+
+    # Create the grid vectors (starting just above zero as in null_clines)
+    k_vec = np.linspace(1e-5, k_max, N)
+    h_vec = np.linspace(1e-5, h_max, M)
+
+    # Add two trailing axes to the parameters so they broadcast against the (h, k) grid
+    s_K, s_H, n, g, delta, alpha, varphi = [np.asarray(x, dtype=float)[..., None, None] for x in (s_K, s_H, n, g, delta, alpha, varphi)]
+
+    # Set the effective depreciation rate and the growth factor of effective labor
+    m = n + g + delta + n * g
+    growth = (1 + n) * (1 + g)
+
+    # Output on the grid from the powers of the grid vectors (N + M powers instead of N * M)
+    y = k_vec**alpha * h_vec[:, None]**varphi
+
+    # Changes from solow_equations: k_{t+1}-k_t and h_{t+1}-h_t
+    dk = (s_K * y - m * k_vec) / growth
+    dh = (s_H * y - m * h_vec[:, None]) / growth
+
+    return k_vec, h_vec, dk, dh
+
+
+def trajectory_bundle(k0, h0, s_K, s_H, n, g, delta, alpha, varphi, T=1000, tol=1e-6):
+    """
+    Iterates a bundle of initial conditions forward together under the law of motion in solow_equations.
+    Each trajectory stops once k and h are within a relative tolerance of its steady state, and only the remaining ones are iterated.
+
+    Args:
+        k0        (float or array): Initial physical capital
+        h0        (float or array): Initial human capital
+        s_K       (float or array): Savings rate in physical capital
+        s_H       (float or array): Savings rate in human capital
+        n         (float or array): Population growth rate
+        g         (float or array): TFP growth rate
+        delta     (float or array): Depreciation rate
+        alpha     (float or array): Output elasticity of physical capital
+        varphi    (float or array): Output elasticity of human capital
+        T                    (int): Maximum number of periods, default = 1000
+        tol                (float): Relative distance to the steady state at which a trajectory stops, default = 1e-6
+
+    Returns:
+        k and h paths with shape (periods + 1, n_trajectories), NaN after a trajectory has stopped,
+        and the number of periods each trajectory took to stop (-1 if it did not within T)
+    """
+    # Broadcast the initial conditions and parameters to one dimension (one value per trajectory)
+    arrays = np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype=float)) for x in (k0, h0, s_K, s_H, n, g, delta, alpha, varphi)])
+    k0, h0, s_K, s_H, n, g, delta, alpha, varphi = [x.ravel() for x in arrays]
+    B = k0.size
+
+    # Steady state of each trajectory
+    k_ss, h_ss, _ = steady_state(s_K, s_H, n, g, delta, alpha, varphi)
+
+    # Coefficients of the law of motion: k_{t+1} = a_k y_t + b k_t and h_{t+1} = a_h y_t + b h_t
+    growth = (1 + n) * (1 + g)
+    a_k = s_K / growth
+    a_h = s_H / growth
+    b = (1 - delta) / growth
+
+    # Create arrays to store the paths and the stopping periods
+    k_paths = np.full((T + 1, B), np.nan)
+    h_paths = np.full((T + 1, B), np.nan)
+    k_paths[0], h_paths[0] = k0, h0
+    steps = np.full(B, -1)
+
+    # State of the trajectories which have not stopped yet
+    idx = np.arange(B)
+    k, h = k0.copy(), h0.copy()
+    state = [a_k, a_h, b, alpha, varphi, k_ss, h_ss]
+
+    t = 0
+    for t in range(1, T + 1):
+        a_k_, a_h_, b_, alpha_, varphi_, k_ss_, h_ss_ = state
+
+        # Update capital of the remaining trajectories
+        y = k**alpha_ * h**varphi_
+        k, h = a_k_ * y + b_ * k, a_h_ * y + b_ * h
+        k_paths[t, idx] = k
+        h_paths[t, idx] = h
+
+        # Stop the trajectories close to their steady state
+        done = (np.abs(k / k_ss_ - 1) < tol) & (np.abs(h / h_ss_ - 1) < tol)
+        if done.any():
+            steps[idx[done]] = t
+            keep = ~done
+            idx, k, h = idx[keep], k[keep], h[keep]
+            state = [x[keep] for x in state]
+            if idx.size == 0:
+                break
+
+    # Drop the periods after all trajectories have stopped
+    return k_paths[:t + 1], h_paths[:t + 1], steps
+
+
 def simulate_growth_paths(s_H, n, g, delta, alpha, varphi, s_K, T=300, shock_time=None, shock_increase=None, incr_savings = False):
     """
     Simulates the growth paths of technology-adjusted per capita physical capital, human capital, and output given the parameters and initial conditions.
@@ -209,3 +514,175 @@ def simulate_growth_paths(s_H, n, g, delta, alpha, varphi, s_K, T=300, shock_tim
         r[t] = alpha * Y[t] / K[t]
 
     return k, h, y, w, r
+
+
+# Output series available from simulate_growth_paths_batch
+GROWTH_SERIES = ('k', 'h', 'y', 'w', 'r')
+
+def simulate_growth_paths_batch(s_H, n, g, delta, alpha, varphi, s_K, T=300, shock_time=None, shock_increase=None, incr_savings=False,
+                                outputs=GROWTH_SERIES, out=None, backend='numpy', exact=True):
+    """
+    Simulates the growth paths for a batch of scenarios at once. Parameters can be arrays (one value per scenario) and are broadcast.
+    The paths are identical to simulate_growth_paths with the numba backend or with exact = True.
+
+    Args:
+        s_H                 (float or array): Savings rate in human capital
+        n                   (float or array): Population growth rate
+        g                   (float or array): Technological progress rate
+        delta               (float or array): Depreciation rate
+        alpha               (float or array): Output elasticity of physical capital
+        varphi              (float or array): Output elasticity of human capital
+        s_K                 (float or array): Savings rate in physical capital
+        T                              (int): Number of periods, default = 300.
+        shock_time    (int, array or None): The time at which s_H increases. If None, there's no increase. Default = None
+        shock_increase (float, array or None): The amount by which s_H increases at the shock time. Default = None
+        incr_savings         (bool or array): Whether s_H increases with output each period. Default = False
+        outputs                      (tuple): Names of the series to return, subset of GROWTH_SERIES
+        out                           (dict): Optional preallocated (or memory-mapped) (n_scenarios, T) arrays for the outputs
+        backend                        (str): 'numpy' or 'numba' (JIT compiled), default = 'numpy'
+        exact                         (bool): Use the scalar C library power in the numpy backend, default = True.
+                                              If False, numpy's SIMD power is used, which is faster but can differ in the last bit
+
+    Returns:
+        Dictionary of (n_scenarios, T) arrays for the selected series
+    """
+    # Set values for s_H_1 as in simulate_growth_paths
+    s_H_1 = 0.0001
+
+    # Replace missing shocks
+    shock_time = -1 if shock_time is None else shock_time
+    shock_increase = 0.0 if shock_increase is None else shock_increase
+
+    # Broadcast the scenario parameters to one dimension
+    params = np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype=float)) for x in (s_H, n, g, delta, alpha, varphi, s_K, shock_time, shock_increase)],
+                                 np.atleast_1d(np.asarray(incr_savings, dtype=bool)))
+    s_H, n, g, delta, alpha, varphi, s_K, shock_time, shock_increase = [x.ravel().copy() for x in params[:-1]]
+    incr_savings = params[-1].ravel()
+    N = s_H.size
+
+    # Check outputs and allocate buffers for those not given
+    for name in outputs:
+        if name not in GROWTH_SERIES:
+            raise ValueError(f'unknown output {name}, use one of {GROWTH_SERIES}')
+    out = {} if out is None else out
+    for name in outputs:
+        if name not in out:
+            out[name] = np.empty((N, T))
+        elif out[name].shape != (N, T):
+            raise ValueError(f'out[{name!r}] has shape {out[name].shape}, expected {(N, T)}')
+
+    # Run the simulation
+    if backend == 'numba':
+        empty = np.empty((0, 0))
+        kernel = _growth_kernel_numba()
+        kernel(s_H, n, g, delta, alpha, varphi, s_K, shock_time, shock_increase, incr_savings, s_H_1, T,
+               *[out.get(name, empty) for name in GROWTH_SERIES], *[name in outputs for name in GROWTH_SERIES])
+    elif backend == 'numpy':
+        power = _libm_power if exact else np.power
+        _growth_numpy(s_H, n, g, delta, alpha, varphi, s_K, shock_time, shock_increase, incr_savings, s_H_1, T, out, outputs, power)
+    else:
+        raise ValueError(f'unknown backend {backend}, use numpy or numba')
+
+    # Return the selected series
+    return {name: out[name] for name in outputs}
+
+
+def _libm_power(x, a):
+    """ Elementwise power with the scalar C library function (as used by numpy scalars) """
+
+    return _LIBM_POWER(x, a).astype(float)
+
+_LIBM_POWER = np.frompyfunc(math.pow, 2, 1)
+
+
+def _growth_numpy(s_H, n, g, delta, alpha, varphi, s_K, shock_time, shock_increase, incr_savings, s_H_1, T, out, outputs, power):
+    """ Advances the state of all scenarios together, one period at a time """
+
+    # Set initial values
+    L = np.ones(s_H.size)
+    A = np.ones(s_H.size)
+    K = np.ones(s_H.size)
+    H = np.ones(s_H.size)
+    Y = power(K, alpha) * power(H, varphi) * power(A*L, 1-alpha-varphi)
+    y = Y / (A*L)
+
+    # Store initial values
+    series = {'k': K / (A*L), 'h': H / (A*L), 'y': y, 'w': (1-alpha) * Y / L, 'r': alpha * Y / K}
+    for name in outputs:
+        out[name][:, 0] = series[name]
+
+    # Create a simulation
+    for t in range(1, T):
+        L = (1 + n) * L
+        A = (1 + g) * A
+        K = s_K * Y + (1 - delta) * K
+
+        # Increase s_H at shock time and with output (adding zero leaves other scenarios unchanged)
+        s_H += np.where(shock_time == t, shock_increase, 0.0)
+        s_H += np.where(incr_savings, s_H_1 * y, 0.0)
+
+        H = s_H * Y + (1 - delta) * H
+        Y = power(K, alpha) * power(H, varphi) * power(A*L, 1-alpha-varphi)
+        y = Y / (A*L)
+
+        # Store the selected series
+        for name in outputs:
+            if name == 'k':
+                out[name][:, t] = K / (A*L)
+            elif name == 'h':
+                out[name][:, t] = H / (A*L)
+            elif name == 'y':
+                out[name][:, t] = y
+            elif name == 'w':
+                out[name][:, t] = varphi * Y / H
+            else:
+                out[name][:, t] = alpha * Y / K
+
+
+_GROWTH_KERNEL = None
+
+def _growth_kernel_numba():
+    """ Compiles the scalar simulation kernel with numba on first use """
+
+    global _GROWTH_KERNEL
+
+    if _GROWTH_KERNEL is None:
+        import numba
+
+        @numba.njit(cache=True)
+        def kernel(s_H, n, g, delta, alpha, varphi, s_K, shock_time, shock_increase, incr_savings, s_H_1, T,
+                   out_k, out_h, out_y, out_w, out_r, do_k, do_h, do_y, do_w, do_r):
+            for i in range(s_H.size):
+                s_H_i = s_H[i]
+                L = 1.0
+                A = 1.0
+                K = 1.0
+                H = 1.0
+                Y = (K**alpha[i]) * (H**varphi[i]) * (A*L)**(1-alpha[i]-varphi[i])
+                y = Y / (A*L)
+                for t in range(T):
+                    if t > 0:
+                        L = (1 + n[i]) * L
+                        A = (1 + g[i]) * A
+                        K = s_K[i] * Y + (1 - delta[i]) * K
+                        if shock_time[i] == t:
+                            s_H_i += shock_increase[i]
+                        if incr_savings[i]:
+                            s_H_i += s_H_1 * y
+                        H = s_H_i * Y + (1 - delta[i]) * H
+                        Y = (K**alpha[i]) * (H**varphi[i]) * (A*L)**(1-alpha[i]-varphi[i])
+                        y = Y / (A*L)
+                    if do_k:
+                        out_k[i, t] = K / (A*L)
+                    if do_h:
+                        out_h[i, t] = H / (A*L)
+                    if do_y:
+                        out_y[i, t] = y
+                    if do_w:
+                        out_w[i, t] = (1-alpha[i]) * Y / L if t == 0 else varphi[i] * Y / H
+                    if do_r:
+                        out_r[i, t] = alpha[i] * Y / K
+
+        _GROWTH_KERNEL = kernel
+
+    return _GROWTH_KERNEL
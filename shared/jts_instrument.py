@@ -0,0 +1,220 @@
+import json
+import time
+import functools
+from collections import deque, Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+# Active tracer, None when instrumentation is disabled
+_TRACER = None
+
+# Traced methods as (class, name, function), wrapped only while tracing
+_METHODS = []
+
+
+class Tracer:
+    """ Collects call counters, nested timing spans, solver statuses and convergence traces """
+
+    def __init__(self, capacity=100_000):
+        """
+        Args:
+            capacity (int): Maximum number of events kept in the ring buffer (the oldest are dropped first), default = 100_000
+        """
+        # Create the ring buffer of events and the aggregates, which are kept in full
+        self.events = deque(maxlen=capacity)
+        self.counters = Counter()
+        self.self_time = Counter()
+        self.recorded = 0
+
+        # Stack of open spans: [name, start time, time spent in child spans]
+        self.stack = []
+        self.t0 = time.perf_counter()
+
+    def path(self):
+        """ Names of the open spans from the outermost to the innermost """
+        return tuple(frame[0] for frame in self.stack)
+
+    def enter(self, name):
+        """ Open a span and count the call """
+        self.counters[name] += 1
+        self.stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        """ Close the innermost span and record its duration """
+        now = time.perf_counter()
+        path = self.path()
+        name, start, child = self.stack.pop()
+        duration = now - start
+
+        # Attribute the time outside child spans to this stack and the full duration to the parent
+        self.self_time[path] += duration - child
+        if self.stack:
+            self.stack[-1][2] += duration
+
+        self.add(('span', name, path, start - self.t0, {'duration': duration}))
+
+    @contextmanager
+    def span(self, name):
+        """ Context manager timing a span """
+        self.enter(name)
+        try:
+            yield self
+        finally:
+            self.exit()
+
+    def count(self, name, n=1):
+        """ Increase a counter """
+        self.counters[name] += n
+
+    def record(self, kind, name, **data):
+        """ Record an event, e.g. kind = 'status' for solver results or 'trace' for objective values """
+        self.add((kind, name, self.path(), time.perf_counter() - self.t0, data))
+
+    def add(self, event):
+        """ Add an event to the ring buffer """
+        self.recorded += 1
+        self.events.append(event)
+
+    @property
+    def dropped(self):
+        """ Number of events dropped from the ring buffer """
+        return self.recorded - len(self.events)
+
+    def select(self, kind=None, name=None):
+        """ Events of a kind and/or name as a list of dictionaries """
+        return [{'kind': k, 'name': n, 'path': list(p), 'time': t, **d} for k, n, p, t, d in self.events
+                if (kind is None or k == kind) and (name is None or n == name)]
+
+    def to_dict(self):
+        """ All counters, span totals and events as a JSON-serializable dictionary """
+        return {'counters': dict(self.counters),
+                'self_time': {';'.join(path): t for path, t in self.self_time.items()},
+                'recorded': self.recorded,
+                'dropped': self.dropped,
+                'events': self.select()}
+
+    def save_json(self, filename):
+        """ Save to_dict as JSON """
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, default=_to_json)
+
+    def collapsed(self):
+        """ Span self times in the collapsed stack format ('a;b;c microseconds' per line) read by flamegraph.pl and speedscope """
+        return '\n'.join(f'{";".join(path)} {round(t * 1e6)}' for path, t in sorted(self.self_time.items()))
+
+    def save_collapsed(self, filename):
+        """ Save collapsed to a file """
+        with open(filename, 'w') as f:
+            f.write(self.collapsed() + '\n')
+
+    def summary(self):
+        """ Print the counters and the total time of each span name """
+        total = Counter()
+        for path, t in self.self_time.items():
+            total[path[-1]] += t
+        for name, n in sorted(self.counters.items()):
+            print(f'{name:32s} {n:10d}' + (f' {total[name]:10.4f}s (self)' if name in total else ''))
+        if self.dropped:
+            print(f'{self.dropped} of {self.recorded} events dropped from the ring buffer')
+
+
+def _to_json(x):
+    """ Convert NumPy values for json.dump """
+    if isinstance(x, np.ndarray):
+        return x.tolist()
+    if isinstance(x, np.generic):
+        return x.item()
+    return str(x)
+
+
+def active():
+    """ The active tracer, None when disabled (check this before building event data in hot code) """
+    return _TRACER
+
+
+@contextmanager
+def tracing(capacity=100_000):
+    """
+    Enable instrumentation inside a with block, tracers can be nested and the previous one is restored on exit
+
+    Args:
+        capacity (int): Size of the ring buffer of events, default = 100_000
+
+    Returns:
+        The Tracer collecting the events
+    """
+    global _TRACER
+    previous = _TRACER
+    _TRACER = Tracer(capacity)
+
+    # Wrap the traced methods while any tracer is active
+    if previous is None:
+        for owner, name, func in _METHODS:
+            setattr(owner, name, _wrap(func))
+    try:
+        yield _TRACER
+    finally:
+        _TRACER = previous
+        if previous is None:
+            for owner, name, func in _METHODS:
+                setattr(owner, name, func)
+
+
+class _TracedMethod:
+    """ Placeholder in a class body which registers the method and puts back the plain function """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __set_name__(self, owner, name):
+        _METHODS.append((owner, name, self.func))
+        setattr(owner, name, self.func)
+
+
+def _wrap(func):
+    """ Wrapper timing each call of func as a span named after it """
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        tracer = _TRACER
+        if tracer is None:
+            return func(*args, **kwargs)
+        tracer.enter(name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            tracer.exit()
+
+    return wrapper
+
+
+def traced(func):
+    """
+    Decorator timing each call of func as a span named after it
+
+    Methods stay plain functions and are only wrapped inside tracing(), so they cost nothing when disabled.
+    Module and nested functions (which may be imported or called by name) are wrapped once and cost a single check when disabled.
+    """
+    if _in_class_body(func):
+        return _TracedMethod(func)
+    return _wrap(func)
+
+
+def _in_class_body(func):
+    """ Whether func is defined in a class body, i.e. its qualname has an enclosing scope which is not a function's <locals> """
+    scope = func.__qualname__.rpartition('.')[0]
+    return scope != '' and not scope.endswith('<locals>')
+
+
+def count(name, n=1):
+    """ Increase a counter of the active tracer """
+    if _TRACER is not None:
+        _TRACER.counters[name] += n
+
+
+def record(kind, name, **data):
+    """ Record an event in the active tracer """
+    if _TRACER is not None:
+        _TRACER.record(kind, name, **data)